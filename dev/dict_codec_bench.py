@@ -0,0 +1,91 @@
+from rich.console import Console
+from rich.table   import Table
+from rich         import box
+import os
+import sys
+import ast
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dlso.sqlite import Database, Dictionary, CODECS, get_codec
+
+
+# Dictionary编解码基准测试：对约1MB的嵌套结构比较str/literal_eval与各编解码器的耗时和体积
+# python dev/dict_codec_bench.py --size 1048576 --repeat 5
+
+console = Console()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Dictionary编解码基准测试")
+    parser.add_argument('--size', type=int, default=1024 * 1024, help='测试数据的大致大小（字节）')
+    parser.add_argument('--repeat', type=int, default=5)
+    return parser.parse_args()
+
+
+def nested_value(size: int) -> dict:
+    rng = random.Random(0)
+    value, approx = {'items': []}, 0
+    while approx < size:
+        item = {
+            'id': rng.randint(0, 1 << 30),
+            'name': ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(12)),
+            'score': rng.random(),
+            'tags': [rng.choice(['a', 'b', 'c', 'd']) for _ in range(4)],
+            'children': [{'k': i, 'v': rng.random()} for i in range(3)],
+        }
+        value['items'].append(item)
+        approx += len(str(item))
+    return value
+
+
+def best_of(repeat: int, func) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    args = parse_args()
+    value = nested_value(args.size)
+
+    table = Table(title=f"Dictionary codecs ({args.size} B nested value, best of {args.repeat})", box=box.ROUNDED)
+    for column in ['codec', 'size KB', 'encode ms', 'decode ms', 'set ms', 'get ms']:
+        table.add_column(column, justify='right')
+
+    legacy = str(value)
+    table.add_row(
+        'str/literal_eval', f"{len(legacy) / 1024:.0f}",
+        f"{best_of(args.repeat, lambda: str(value)) * 1000:.1f}",
+        f"{best_of(args.repeat, lambda: ast.literal_eval(legacy)) * 1000:.1f}", '-', '-',
+    )
+
+    db = Database(':memory:')
+    for name in CODECS:
+        try:
+            codec = get_codec(name)
+        except ImportError:
+            console.print(f"[yellow]{name} 未安装，跳过[/yellow]")
+            continue
+        data = codec.encode(value)
+        store = Dictionary(db, f'bench_{name}', codec=codec)
+        table.add_row(
+            name, f"{len(data) / 1024:.0f}",
+            f"{best_of(args.repeat, lambda: codec.encode(value)) * 1000:.1f}",
+            f"{best_of(args.repeat, lambda: codec.decode(data)) * 1000:.1f}",
+            f"{best_of(args.repeat, lambda: store.set('value', value)) * 1000:.1f}",
+            f"{best_of(args.repeat, lambda: store.get('value')) * 1000:.1f}",
+        )
+    db.close()
+    console.print(table)
+
+
+if __name__ == '__main__':
+    main()
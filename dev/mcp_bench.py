@@ -0,0 +1,187 @@
+from concurrent.futures import ThreadPoolExecutor
+from rich.console       import Console
+from rich.table         import Table
+from rich               import box
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tracemalloc
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dlso import MCPClient, AsyncMCPClient
+
+
+# MCP客户端基准测试：对本地模拟服务逐级提高并发，统计吞吐、延迟分位数和每个在途请求的内存
+# python dev/mcp_bench.py --transport stdio sse http --concurrency 1 8 32 --latency 5 --payload 4096
+
+MOCK_SERVER = os.path.join(ROOT, 'dev', 'mcp_mock_server.py')
+console = Console()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="MCP客户端基准测试")
+    parser.add_argument('--transport', nargs='+', default=['stdio', 'sse', 'http'], choices=['stdio', 'sse', 'http'])
+    parser.add_argument('--client', nargs='+', default=['sync'], choices=['sync', 'async'])
+    parser.add_argument('--method', nargs='+', default=['call_tool'], choices=['call_tool', 'list_tools'])
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4, 16, 64])
+    parser.add_argument('--requests', type=int, default=500, help='每个并发等级的请求数')
+    parser.add_argument('--latency', type=float, default=0, help='模拟服务的响应延迟（毫秒）')
+    parser.add_argument('--payload', type=int, default=1024, help='模拟服务的返回内容大小（字节）')
+    parser.add_argument('--json', default=None, help='将结果写入JSON文件，作为回归基线')
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    index = min(int(round(p / 100 * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def server_args(args) -> list:
+    return [sys.executable, MOCK_SERVER, '--latency', str(args.latency), '--payload', str(args.payload)]
+
+
+def start_http_server(args) -> tuple:
+    port = free_port()
+    process = subprocess.Popen(server_args(args) + ['--http', str(port)], stdout=subprocess.PIPE, text=True)
+    process.stdout.readline()  # 等待服务启动
+    return process, f'http://127.0.0.1:{port}'
+
+
+def endpoint_for(transport: str, args, base_url: str) -> str:
+    if transport == 'stdio':
+        return ' '.join(server_args(args))
+    if transport == 'sse':
+        return f'{base_url}/sse'
+    return f'{base_url}/mcp'
+
+
+def summarize(latencies: list, elapsed: float, memory: int, concurrency: int) -> dict:
+    return {
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mem_per_request_kb': memory / concurrency / 1024,
+    }
+
+
+def bench_sync(endpoint: str, transport: str, method: str, levels: list, total: int) -> list:
+    client = MCPClient(endpoint, transport=transport, pool_size=max(levels))
+    if not client._running:
+        raise ConnectionError(f'Failed to connect: {endpoint}')
+    call = (lambda: client.call_tool('echo', {})) if method == 'call_tool' else (lambda: client.list_tools(refresh=True))
+
+    def timed(_):
+        start = time.perf_counter()
+        call()
+        return time.perf_counter() - start
+
+    results = []
+    try:
+        for _ in range(20): call()  # 预热
+        for concurrency in levels:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                start = time.perf_counter()
+                latencies = list(executor.map(timed, range(total)))
+                elapsed = time.perf_counter() - start
+
+                # 单独一轮：每个线程同时发出一个请求，统计内存峰值
+                tracemalloc.start()
+                base = tracemalloc.get_traced_memory()[0]
+                list(executor.map(timed, range(concurrency)))
+                memory = tracemalloc.get_traced_memory()[1] - base
+                tracemalloc.stop()
+            results.append(dict(concurrency=concurrency, **summarize(latencies, elapsed, memory, concurrency)))
+    finally:
+        client.close()
+    return results
+
+
+async def bench_async(endpoint: str, transport: str, method: str, levels: list, total: int) -> list:
+    client = await AsyncMCPClient.create(endpoint, transport=transport)
+    call = (lambda: client.call_tool('echo', {})) if method == 'call_tool' else client.list_tools
+
+    async def timed(semaphore: asyncio.Semaphore) -> float:
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            return time.perf_counter() - start
+
+    results = []
+    try:
+        for _ in range(20): await call()
+        for concurrency in levels:
+            semaphore = asyncio.Semaphore(concurrency)
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*(timed(semaphore) for _ in range(total)))
+            elapsed = time.perf_counter() - start
+
+            tracemalloc.start()
+            base = tracemalloc.get_traced_memory()[0]
+            await asyncio.gather(*(timed(semaphore) for _ in range(concurrency)))
+            memory = tracemalloc.get_traced_memory()[1] - base
+            tracemalloc.stop()
+            results.append(dict(concurrency=concurrency, **summarize(latencies, elapsed, memory, concurrency)))
+    finally:
+        await client.close()
+    return results
+
+
+def main():
+    args = parse_args()
+    server, base_url = (None, None)
+    if set(args.transport) & {'sse', 'http'}:
+        server, base_url = start_http_server(args)
+
+    table = Table(title=f"MCP benchmark (latency={args.latency}ms, payload={args.payload}B, requests={args.requests})", box=box.ROUNDED)
+    for column in ['transport', 'client', 'method', 'concurrency', 'req/s', 'p50 ms', 'p99 ms', 'KB/in-flight']:
+        table.add_column(column, justify='right')
+
+    report = []
+    try:
+        for transport in args.transport:
+            endpoint = endpoint_for(transport, args, base_url)
+            for client in args.client:
+                for method in args.method:
+                    try:
+                        if client == 'sync':
+                            results = bench_sync(endpoint, transport, method, args.concurrency, args.requests)
+                        else:
+                            results = asyncio.run(bench_async(endpoint, transport, method, args.concurrency, args.requests))
+                    except Exception as e:
+                        console.print(f"[red]{transport}/{client}/{method} 失败: {e}[/red]")
+                        continue
+                    for row in results:
+                        row.update(transport=transport, client=client, method=method)
+                        report.append(row)
+                        table.add_row(
+                            transport, client, method, str(row['concurrency']),
+                            f"{row['throughput']:.0f}", f"{row['p50_ms']:.2f}", f"{row['p99_ms']:.2f}",
+                            f"{row['mem_per_request_kb']:.1f}",
+                        )
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    console.print(table)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': report}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+from http.server  import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import argparse
+import threading
+import queue
+import uuid
+import json
+import time
+import sys
+
+
+# 本地MCP模拟服务，用于基准测试：可配置响应延迟和返回内容大小
+# stdio:  python dev/mcp_mock_server.py --latency 10 --payload 1024
+# HTTP:   python dev/mcp_mock_server.py --http 8931   (SSE: /sse, Streamable HTTP: /mcp)
+
+CONFIG = {
+    'latency': 0.0,   # 秒
+    'payload': 64,    # 字节
+    'serial': False,  # 模拟一次只能处理一个请求的服务
+}
+
+_serial_lock = threading.Lock()
+
+
+def handle(message: dict):
+    method = message.get('method')
+    msg_id = message.get('id')
+    if msg_id is None:
+        return None
+    if method == 'initialize':
+        result = {
+            'protocolVersion': message.get('params', {}).get('protocolVersion', '2024-11-05'),
+            'capabilities': {'tools': {}},
+            'serverInfo': {'name': 'mock', 'version': '0.1.0'},
+        }
+    elif method == 'tools/list':
+        result = {'tools': [{
+            'name': 'echo',
+            'description': 'Return a payload of the configured size',
+            'inputSchema': {'type': 'object', 'properties': {}},
+        }]}
+    elif method == 'tools/call':
+        if CONFIG['serial']:
+            with _serial_lock:
+                time.sleep(CONFIG['latency'])
+        elif CONFIG['latency']:
+            time.sleep(CONFIG['latency'])
+        result = {'content': [{'type': 'text', 'text': 'x' * CONFIG['payload']}]}
+    elif method == 'ping':
+        result = {}
+    else:
+        return {'jsonrpc': '2.0', 'id': msg_id, 'error': {'code': -32601, 'message': f'Method not found: {method}'}}
+    return {'jsonrpc': '2.0', 'id': msg_id, 'result': result}
+
+
+def serve_stdio():
+    write_lock = threading.Lock()
+
+    def reply(message):
+        response = handle(message)
+        if response is None: return
+        data = json.dumps(response) + '\n'
+        with write_lock:
+            sys.stdout.write(data)
+            sys.stdout.flush()
+
+    for line in sys.stdin:
+        try:
+            message = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        threading.Thread(target=reply, args=(message,), daemon=True).start()
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # 默认5，高并发时握手排队会导致秒级重传
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    sessions: dict[str, queue.Queue] = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _send(self, code, body=b'', content_type='application/json', headers=None):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path != '/sse':
+            return self._send(405)
+        session_id = uuid.uuid4().hex
+        messages = queue.Queue()
+        self.sessions[session_id] = messages
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        try:
+            self.wfile.write(f'event: endpoint\ndata: /messages?session_id={session_id}\n\n'.encode())
+            self.wfile.flush()
+            while True:
+                try:
+                    message = messages.get(timeout=15)
+                except queue.Empty:
+                    self.wfile.write(b': keepalive\n\n')
+                    self.wfile.flush()
+                    continue
+                self.wfile.write(f'event: message\ndata: {json.dumps(message)}\n\n'.encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.sessions.pop(session_id, None)
+            self.close_connection = True
+
+    def do_POST(self):
+        parsed = urlparse(self.path)
+        message = self._read_json()
+        if parsed.path == '/messages':
+            session_id = parse_qs(parsed.query).get('session_id', [''])[0]
+            messages = self.sessions.get(session_id)
+            if messages is None:
+                return self._send(404)
+            self._send(202, b'Accepted', content_type='text/plain')
+            response = handle(message)
+            if response is not None:
+                messages.put(response)
+        elif parsed.path == '/mcp':
+            response = handle(message)
+            if response is None:
+                return self._send(202)
+            self._send(200, json.dumps(response).encode(), headers={'Mcp-Session-Id': 'mock'})
+        else:
+            self._send(404)
+
+    def do_DELETE(self):
+        self._send(200)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地MCP模拟服务")
+    parser.add_argument('--http', type=int, default=None, help='以HTTP方式监听的端口，不指定时使用stdio')
+    parser.add_argument('--latency', type=float, default=0, help='每次工具调用的延迟（毫秒）')
+    parser.add_argument('--payload', type=int, default=64, help='工具调用返回内容的大小（字节）')
+    parser.add_argument('--serial', action='store_true', help='一次只处理一个工具调用')
+    args = parser.parse_args()
+    CONFIG.update(latency=args.latency / 1000, payload=args.payload, serial=args.serial)
+
+    if args.http is None:
+        serve_stdio()
+        return
+    server = MockServer(('127.0.0.1', args.http), MockHandler)
+    print(f'Mock MCP server on http://127.0.0.1:{args.http} (/sse, /mcp)', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
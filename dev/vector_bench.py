@@ -0,0 +1,109 @@
+from rich.console import Console
+from rich.table   import Table
+from rich         import box
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+from dlso.sqlite import Database
+from dlso.vector import IVFIndex, VectorStore
+
+
+# 向量检索基准测试：在带聚类结构的合成数据上比较精确检索、IVF索引和量化粗排+精确重排的延迟和recall@10
+# python dev/vector_bench.py --count 200000 --dim 256 --nprobe 1 4 16 64
+
+console = Console()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="向量检索基准测试")
+    parser.add_argument('--count', type=int, default=200000, help='向量数量')
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--clusters', type=int, default=1000, help='合成数据的簇数量')
+    parser.add_argument('--noise', type=float, default=2.0, help='簇内噪声，越大越接近均匀分布、越难检索')
+    parser.add_argument('--nlist', type=int, default=None, help='IVF聚类中心数量，默认4*sqrt(count)')
+    parser.add_argument('--nprobe', nargs='+', type=int, default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--rerank', type=int, default=None, help='量化检索的重排候选倍数，默认由VectorStore决定')
+    return parser.parse_args()
+
+
+def synthetic(count: int, dim: int, clusters: int, noise: float, seed: int=0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, count)
+    vectors = centers[labels] + noise * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main():
+    args = parse_args()
+    data = synthetic(args.count + args.queries, args.dim, args.clusters, args.noise)
+    vectors, queries = data[:args.count], data[args.count:]
+    ids = [str(i) for i in range(args.count)]
+
+    start = time.perf_counter()
+    truth = []
+    for q in queries:
+        scores = vectors @ q
+        top = np.argpartition(-scores, args.k)[:args.k]
+        truth.append(set(top.tolist()))
+    exact_ms = (time.perf_counter() - start) * 1000 / args.queries
+
+    nlist = args.nlist or int(4 * np.sqrt(args.count))
+    index = IVFIndex(args.dim, nlist)
+    start = time.perf_counter()
+    index.train(vectors)
+    train_s = time.perf_counter() - start
+    start = time.perf_counter()
+    index.add(ids, vectors)
+    add_s = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'index.npz')
+        start = time.perf_counter()
+        index.save(path)
+        index = IVFIndex.load(path)
+        io_s = time.perf_counter() - start
+
+        # 量化检索需要数据库中的原始向量做重排
+        db = Database(os.path.join(directory, 'vectors.db'))
+        VectorStore(db, 'vectors', metric='dot').upsert(ids, vectors)
+        quantized = []
+        for mode in ('int8', 'binary'):
+            store = VectorStore(db, 'vectors', metric='dot', quantize=mode, rerank=args.rerank)
+            start = time.perf_counter()
+            results = [store.search(q, args.k) for q in queries]
+            elapsed_ms = (time.perf_counter() - start) * 1000 / args.queries
+            hits = sum(len({int(r['id']) for r in found} & expected) for found, expected in zip(results, truth))
+            quantized.append((mode, store.rerank, elapsed_ms, hits, vectors.nbytes / store.nbytes))
+        db.close()
+
+    table = Table(title=f"Vector search (count={args.count}, dim={args.dim}, nlist={nlist}, k={args.k})", box=box.ROUNDED)
+    for column in ['method', 'nprobe', 'ms/query', f'recall@{args.k}', 'speedup']:
+        table.add_column(column, justify='right')
+    table.add_row('exact', '-', f"{exact_ms:.2f}", '1.000', '1.0x')
+    for nprobe in args.nprobe:
+        hits = 0
+        start = time.perf_counter()
+        results = [index.search(q, args.k, nprobe) for q in queries]
+        elapsed_ms = (time.perf_counter() - start) * 1000 / args.queries
+        for found, expected in zip(results, truth):
+            hits += len({int(id) for id, _ in found} & expected)
+        table.add_row('ivf', str(nprobe), f"{elapsed_ms:.2f}", f"{hits / (args.k * args.queries):.3f}", f"{exact_ms / elapsed_ms:.1f}x")
+    for mode, rerank, elapsed_ms, hits, ratio in quantized:
+        table.add_row(f"{mode} x{rerank}, {ratio:.0f}x smaller", '-', f"{elapsed_ms:.2f}", f"{hits / (args.k * args.queries):.3f}", f"{exact_ms / elapsed_ms:.1f}x")
+
+    console.print(table)
+    console.print(f"train {train_s:.2f}s, add {add_s:.2f}s, save+load {io_s:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -15,7 +15,13 @@ from .weather_forecast import (
     CMA
 )
 from .mcp import (
-    MCPClient, MCPGroup
+    MCPClient, MCPGroup, MCPPool, MCPSupervisor
+)
+from .mcp_async import (
+    AsyncMCPClient, AsyncMCPGroup
+)
+from .mcp_server import (
+    MCPServer
 )
 from .email_client import (
     EmailService
@@ -0,0 +1,4 @@
+from .mcp_server import main
+
+
+main()
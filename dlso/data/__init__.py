@@ -16,6 +16,13 @@ class Notification:
     kwargs: dict = field(default_factory=dict)
 
 
+@dataclass
+class SSEEvent:
+    event: str = field(default='message')
+    data: str  = field(default='')
+    id: str    = field(default=None)
+
+
 @dataclass
 class GeoPoint:
     lat: float = field(default=None)
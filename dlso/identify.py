@@ -135,6 +135,7 @@ class Identify:
         self.var_keyword_desc = var_keyword_desc
         self.on_calling: Callable = None
         self.on_called: Callable = None
+        self._mcp_clients: dict[str, MCPClient] = {}
     
     @property
     def functions_list(self) -> Dict[str, str]:
@@ -182,20 +183,46 @@ class Identify:
         
         return self
     
-    def add_mcp(self, mcp: MCPClient):
-        tools = mcp.list_tools()
+    def add_mcp(self, mcp: MCPClient, tools: list=None):
+        """注册MCP服务器的所有工具，并在服务端工具列表变化时自动增量更新
+        
+        Args:
+            mcp: MCPClient实例
+            tools: 已获取的工具列表，为空时自动获取
+        """
+        if tools is None:
+            tools = mcp.list_tools()
+        watching = self._mcp_clients.get(mcp.server_name) is mcp
+        self._mcp_clients[mcp.server_name] = mcp
+        self._sync_mcp(mcp, tools)
+        if not watching:
+            def on_list_changed(params):
+                # 客户端已被移除或替换时不再处理
+                if self._mcp_clients.get(mcp.server_name) is mcp:
+                    self._sync_mcp(mcp, mcp.list_tools())
+            mcp.on_notification('notifications/tools/list_changed', on_list_changed)
+    
+    def _sync_mcp(self, mcp: MCPClient, tools: list) -> None:
+        """按工具列表增量更新指定MCP服务器的工具，只改动新增、删除或变化的部分"""
+        current = {
+            func_name for func_name, func_info in list(self._map.items())
+            if func_info.get('mcp_name') == mcp.server_name
+        }
+        latest = set()
         for tool in tools:
             func_name = tool['name']
-            description = tool['description']
-            parameters = tool['inputSchema']
-            
-            # 注册函数元数据
-            self._functions[func_name] = {
+            latest.add(func_name)
+            metadata = {
                 'type': 'function',
                 'name': func_name,
-                'description': description,
-                'parameters': parameters,
+                'description': tool.get('description', ''),
+                'parameters': tool.get('inputSchema', {'type': 'object', 'properties': {}}),
             }
+            if func_name in current and self._functions.get(func_name) == metadata:
+                continue
+            
+            # 注册函数元数据
+            self._functions[func_name] = metadata
             
             # 使用闭包工厂捕获当前func_name的值
             def create_tool_function(current_func_name):
@@ -208,6 +235,10 @@ class Identify:
                 'original_function': create_tool_function(func_name),  # 立即绑定当前func_name
                 'mcp_name': mcp.server_name,
             }
+        
+        for func_name in current - latest:
+            self._functions.pop(func_name, None)
+            self._map.pop(func_name, None)
     
     def remove_mcp(self, name: str) -> None:
         """移除指定MCP服务器的所有工具
@@ -217,7 +248,7 @@ class Identify:
         """
         # 找出所有属于该MCP服务器的工具
         to_remove = [
-            func_name for func_name, func_info in self._map.items() 
+            func_name for func_name, func_info in list(self._map.items())
             if func_info.get('mcp_name') == name
         ]
         
@@ -225,6 +256,7 @@ class Identify:
         for func_name in to_remove:
             self._functions.pop(func_name, None)
             self._map.pop(func_name, None)
+        self._mcp_clients.pop(name, None)
         
     def identify(self, func: Callable[..., Any]) -> Callable[..., Any]:
         '''
@@ -446,7 +478,7 @@ class Identify:
         '''
         if not func_name:
             info = []
-            for f in self._functions:
+            for f in list(self._functions):
                 info.append(self.req_info(f, strict=strict))
             return info
         if func_name in self._functions:
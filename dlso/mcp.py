@@ -1,61 +1,341 @@
-from typing       import Dict, Optional, Union
-from sseclient    import SSEClient
-from urllib.parse import urlparse
+from typing             import Callable, Dict, List, Optional, Union
+from urllib.parse       import urlparse
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from collections        import deque
+from .data              import SSEEvent
 import threading
+import time
 import requests
+import requests.adapters
 import queue
 import json
+import re
 import subprocess
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _loads(data):
+    """解析JSON，安装了orjson时优先使用（可直接解析memoryview，无需复制）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def _dumps(data) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            pass
+    return json.dumps(data).encode('utf-8')
+
+
+class SSEParser:
+    """增量SSE解析器，按字节块喂入数据，返回已完整接收的事件"""
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self._scan = 0  # 缓冲区中尚未查找过换行的位置
+        self._event = None
+        self._data: List[str] = []
+        self._id = None
+
+    def feed(self, chunk: bytes) -> List[SSEEvent]:
+        # 只在新到达的数据中查找换行，大事件分多块到达时不会反复复制和扫描整个缓冲区
+        events = []
+        buffer = self._buffer
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b'\n', self._scan)
+            if end < 0:
+                break
+            line = buffer[start:end - 1 if end > start and buffer[end - 1] == 13 else end]
+            event = self._feed_line(line.decode('utf-8', errors='replace'))
+            if event: events.append(event)
+            start = self._scan = end + 1
+        if start:
+            del buffer[:start]  # 最后一段可能不完整，留待下次拼接
+        self._scan = len(buffer)
+        return events
+
+    def _feed_line(self, line: str) -> Optional[SSEEvent]:
+        if not line:
+            # 空行表示一个事件结束
+            if not self._data and self._event is None:
+                return None
+            event = SSEEvent(event=self._event or 'message', data='\n'.join(self._data), id=self._id)
+            self._event = None
+            self._data = []
+            return event
+        if line.startswith(':'):
+            return None  # 注释/心跳
+        field, _, value = line.partition(':')
+        if value.startswith(' '):
+            value = value[1:]
+        if field == 'event':
+            self._event = value
+        elif field == 'data':
+            self._data.append(value)
+        elif field == 'id':
+            self._id = value
+        return None
+
+
+def _iter_stream(response: requests.Response):
+    """逐块读取流式响应，数据到达即返回"""
+    raw = response.raw
+    if not raw.chunked and hasattr(raw, 'read1'):
+        # 非chunked的事件流没有长度，iter_content会一直读到连接关闭
+        while True:
+            chunk = raw.read1(65536)
+            if not chunk: break
+            yield chunk
+    else:
+        yield from response.iter_content(chunk_size=None)
+
+
+class _Framer:
+    """将字节流切分为以换行分隔的JSON消息
+
+    数据按块追加到同一个缓冲区，只在新到达的数据中查找换行，帧通过memoryview切片直接解析。
+    超过max_message_size的消息会被丢弃，并在其结束时返回一个错误响应：能从消息开头或结尾识别出顶层ID时
+    对应该请求，否则id为None，由调用方让所有等待中的请求失败。
+    """
+    _HEAD_ID = re.compile(rb'\s*\{\s*(?:"jsonrpc"\s*:\s*"2\.0"\s*,\s*)?"id"\s*:\s*(\d+)')
+    _TAIL_ID = re.compile(rb'[,{]\s*"id"\s*:\s*(\d+)\s*\}\s*$')
+
+    def __init__(self, max_message_size: int, source: str='') -> None:
+        self.max_message_size = max_message_size
+        self.source = source
+        self._buffer = bytearray()
+        self._scan = 0          # 缓冲区中尚未查找过换行的位置
+        self._skipping = False  # 正在丢弃超长消息的剩余部分
+        self._head = b''        # 被丢弃消息的开头和结尾，用于识别ID
+        self._tail = b''
+
+    def feed(self, data) -> List[dict]:
+        messages = []
+        buffer = self._buffer
+        buffer += data
+        start = 0
+        while True:
+            end = buffer.find(b'\n', self._scan)
+            if end < 0:
+                break
+            if self._skipping:
+                self._skipping = False
+                messages.append(self._oversize_error(self._head, (self._tail + bytes(buffer[max(start, end - 256):end]))[-256:]))
+            elif end > start:
+                message = self._parse_frame(buffer, start, end)
+                if message is not None:
+                    messages.append(message)
+            start = self._scan = end + 1
+        if start:
+            del buffer[:start]
+        self._scan = len(buffer)
+        if not self._skipping and len(buffer) > self.max_message_size:
+            self._head, self._tail = bytes(buffer[:256]), b''
+            self._skipping = True
+        if self._skipping:
+            self._tail = (self._tail + bytes(buffer[-256:]))[-256:]
+            buffer.clear()
+            self._scan = 0
+        return messages
+
+    @staticmethod
+    def _parse_frame(buffer: bytearray, start: int, end: int):
+        with memoryview(buffer) as view:
+            frame = view[start:end]
+            try:
+                message = _loads(frame)
+            except ValueError:
+                return None
+            finally:
+                frame.release()
+        return message if isinstance(message, dict) else None
+
+    def _oversize_error(self, head: bytes, tail: bytes) -> dict:
+        # 只匹配顶层的id：位于对象开头（可在jsonrpc之后），或是对象的最后一个字段
+        match = self._HEAD_ID.match(head) or self._TAIL_ID.search(tail)
+        error = {
+            "jsonrpc": "2.0",
+            "id": int(match.group(1)) if match else None,
+            "error": {"code": -32000, "message": f"Message exceeds max_message_size ({self.max_message_size} bytes)"},
+        }
+        print(f"Discarded oversized message from {self.source} (id={error['id']})")
+        return error
+
 
 class StdioClient:
-    def __init__(self, command:str) -> None:
+    def __init__(self, command:str, stderr_lines:int=100, max_message_size:int=64 * 1024 * 1024) -> None:
         self.command = command
-        self.process: subprocess.Popen = subprocess.Popen(self.command.split(' '), stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        # 以二进制方式打开管道，按字节切分消息，避免逐字符解码大响应
+        self.process: subprocess.Popen = subprocess.Popen(self.command.split(' '), stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         self.stdin = self.process.stdin
         self.stdout = self.process.stdout
+        self.max_message_size = max_message_size
+        # 持续读取stderr，避免输出过多时管道写满导致服务端阻塞，只保留最近几行用于排查
+        self.stderr_tail: deque = deque(maxlen=stderr_lines)
+        threading.Thread(target=self._drain_stderr, daemon=True).start()
+
+    def _drain_stderr(self):
+        try:
+            for line in self.process.stderr:
+                self.stderr_tail.append(line.decode('utf-8', errors='replace').rstrip('\r\n'))
+        except (OSError, ValueError):
+            pass
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def write(self, data: dict):
+        self.stdin.write(_dumps(data) + b'\n')
+        self.stdin.flush()
+
+    def iter_messages(self):
+        """从stdout读取以换行分隔的JSON消息，切分规则见_Framer"""
+        framer = _Framer(self.max_message_size, self.command)
+        chunk = bytearray(65536)  # 复用的读缓冲区，避免每次读取都分配新对象
+        while True:
+            size = self.stdout.readinto1(chunk)
+            if not size:
+                break
+            with memoryview(chunk) as view:
+                messages = framer.feed(view[:size])
+            yield from messages
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
 
 
 class MCPClient:
-    def __init__(self, endpoint:str|list, name='mcp', version='0.1.0'):
+    # 收到这些通知时作废对应列表的缓存
+    _INVALIDATES = {
+        'notifications/tools/list_changed': 'tools/list',
+        'notifications/resources/list_changed': 'resources/list',
+        'notifications/prompts/list_changed': 'prompts/list',
+    }
+
+    def __init__(self, endpoint:str|list, name='mcp', version='0.1.0', transport:str=None, timeout:float=10, pool_size:int=16, connect:bool=True, max_message_size:int=64 * 1024 * 1024):
+        """
+        Args:
+            endpoint: 服务地址或stdio命令
+            name: 客户端名称
+            version: 客户端版本
+            transport: 传输方式 'stdio' / 'sse' / 'http'，为空时根据endpoint自动判断
+            timeout: HTTP连接与请求超时（秒）
+            pool_size: HTTP连接池大小
+            connect: 是否立即连接，为False时需手动调用connect()
+            max_message_size: stdio单条消息的最大字节数，超出的响应会以错误返回
+        """
         if isinstance(endpoint, list):
             endpoint = ' '.join(endpoint)
         self._method: str = None
+        self._transport_fixed = transport is not None
         self.client_name = name
         self.client_version = version
         self.server_name = None
         self.server_version = None
-        self.base_url = self._parse_base_url(endpoint)
+        self.timeout = timeout
+        self.base_url = self._parse_base_url(endpoint, transport)
         self.session = None
         self.endpoint = endpoint
         self.endpoint_ready = threading.Event()
         self.response_queues = {}
         self.lock = threading.Lock()
-        self._running = True
+        self._running = False
         self._next_id = 0  # 自增ID计数器
         self._stdio: StdioClient = None
+        self._http: requests.Session = None
+        self._pool_size = pool_size
+        self.max_message_size = max_message_size
+        self._write_lock = threading.Lock()
+        self.server_capabilities: dict = {}
+        # 工具/资源/提示词列表与资源内容的缓存，键为方法名或(方法名, URI)
+        self._cache: dict = {}
+        self._cache_versions: dict = {}  # 每次失效时递增，防止并发刷新写入过期缓存
+        self._subscriptions: set = set()
+        self._notification_handlers: Dict[str, List[Callable]] = {}
+
+        if connect:
+            self.connect()
+
+    def connect(self) -> bool:
+        """启动传输通道并完成initialize握手
+
+        Returns:
+            是否连接成功
+        """
+        self._running = True
+        self.session = None
+        self.endpoint_ready.clear()
+        if self._method in ('sse', 'http'):
+            # 每个客户端复用一个保持连接的会话，避免每次调用重新建立连接
+            self._http = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size)
+            self._http.mount('http://', adapter)
+            self._http.mount('https://', adapter)
 
         # 启动消息接收线程
         if self._method == 'sse':
-            self.recv_thread = threading.Thread(target=self._sse_recv_loop, daemon=True)
-            self.recv_thread.start()
+            self._start_sse()
+        if self._method == 'http':
+            self.endpoint_ready.set()
         if self._method == 'stdio':
             try:
-                self._stdio = StdioClient(self.endpoint)
+                self._stdio = StdioClient(self.endpoint, max_message_size=self.max_message_size)
+                self.recv_thread = threading.Thread(target=self._stdio_recv_loop, args=(self._stdio,), daemon=True)
+                self.recv_thread.start()
                 self.endpoint_ready.set()
             except:
                 self._running = False
                 raise Exception(f"Failed to start stdio client: {self.endpoint}")
+        # 重新连接后服务端不再保留订阅，缓存全部作废
+        self._cache = {}
+        self._subscriptions = set()
         try:
             self._init_client()
         except:
             self._running = False
+        if self._running and self._method == 'http':
+            # 打开服务端推送流以接收通知，服务端不支持时忽略
+            threading.Thread(target=self._http_listen_loop, daemon=True).start()
+        return self._running
     
     def _init_client(self):
-        data = self.post(
+        try:
+            data = self._initialize()
+        except ConnectionError as e:
+            # 未指定传输方式时，不支持Streamable HTTP的服务端回退到旧版SSE
+            if self._method != 'http' or self._transport_fixed or getattr(e, 'status_code', None) not in (400, 404, 405):
+                raise
+            self._method = 'sse'
+            self.endpoint_ready.clear()
+            self._start_sse()
+            data = self._initialize()
+        self.server_capabilities = data.get('result', {}).get("capabilities", {})
+        data = data.get('result', {}).get("serverInfo", {})
+        self.server_name = data.get("name")
+        self.server_version = data.get("version")
+        self.post(
+            method="notifications/initialized",
+            wait_for_response=False
+        )
+
+    def _initialize(self) -> dict:
+        return self.post(
             method="initialize",
             params={
-                "protocolVersion": "2024-11-05",
+                "protocolVersion": "2025-03-26" if self._method == 'http' else "2024-11-05",
                 "capabilities": {},
                 "clientInfo": {
                     "name": self.client_name,
@@ -63,66 +343,220 @@ class MCPClient:
                 }
             }
         )
-        data = data.get('result', {}).get("serverInfo", {})
-        self.server_name = data.get("name")
-        self.server_version = data.get("version")
-        self.post(
-            method="notifications/initialized",
-            wait_for_response=False
-        )
 
-    def _parse_base_url(self, endpoint):
+    def _parse_base_url(self, endpoint, transport=None):
         """从endpoint解析基础URL"""
-        if not 'http' in endpoint:
+        if transport == 'stdio' or (transport is None and not 'http' in endpoint):
             self._method = 'stdio'
             return ''
-        self._method = 'sse'
         parsed = urlparse(endpoint)
+        if transport:
+            self._method = transport
+        else:
+            # 旧版SSE服务一般以/sse结尾，其余按Streamable HTTP处理
+            self._method = 'sse' if parsed.path.rstrip('/').endswith('/sse') else 'http'
         return f"{parsed.scheme}://{parsed.netloc}"
 
-    def _sse_recv_loop(self):
-        messages = SSEClient(self.endpoint)
-        
-        event = None
-        for msg in messages:
-            if not self._running:
-                break
+    def _start_sse(self):
+        self.recv_thread = threading.Thread(target=self._sse_recv_loop, args=(self._http,), daemon=True)
+        self.recv_thread.start()
 
-            if not msg.data:
-                event = msg.event
-                continue
+    def _sse_recv_loop(self, http: requests.Session):
+        try:
+            response = http.get(
+                self.endpoint,
+                headers={'Accept': 'text/event-stream'},
+                stream=True,
+                timeout=(self.timeout, None)
+            )
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            if http is not self._http: return
+            print(f"Failed to open SSE stream: {self.endpoint} ({e})")
+            self._running = False
+            self.endpoint_ready.set()
+            return
 
-            if event == "endpoint" or 'session_id' in msg.data:
-                self.session = msg.data
-                self.endpoint_ready.set()
-                event = msg.event
-                continue
+        parser = SSEParser()
+        try:
+            for chunk in _iter_stream(response):
+                if not self._running:
+                    break
+                for event in parser.feed(chunk):
+                    if event.event == "endpoint" or 'session_id' in event.data:
+                        self.session = event.data
+                        self.endpoint_ready.set()
+                        continue
+                    message = self._parse_event(event)
+                    if message: self._handle_message(message)
+        except requests.exceptions.RequestException:
+            pass
+        finally:
+            response.close()
+            # 重连后旧的接收线程退出时不影响新连接
+            if http is self._http:
+                self._running = False
+                self._fail_pending()
 
+    def _http_listen_loop(self):
+        try:
+            response = self._http.get(
+                self.endpoint,
+                headers={'Accept': 'text/event-stream', 'Mcp-Session-Id': self.session or ''},
+                stream=True,
+                timeout=(self.timeout, None)
+            )
+        except requests.exceptions.RequestException:
+            return
+        with response:
+            if response.status_code != 200 or not response.headers.get('Content-Type', '').startswith('text/event-stream'):
+                return
+            parser = SSEParser()
             try:
-                data = json.loads(msg.data)
-                msg_id = data.get("id")
-            except json.JSONDecodeError:
-                continue
+                for chunk in _iter_stream(response):
+                    if not self._running:
+                        break
+                    for event in parser.feed(chunk):
+                        message = self._parse_event(event)
+                        if message: self._handle_message(message)
+            except requests.exceptions.RequestException:
+                pass
 
-            with self.lock:
-                if msg_id in self.response_queues:
-                    self.response_queues[msg_id].put(data)
-                else:
-                    print(f"Unmatched response (id={msg_id})")
-    
-    def _stdio_recv(self):
-        if not self._running: return
+    def _parse_event(self, event: SSEEvent) -> Optional[dict]:
         try:
-            data = self._stdio.stdout.readline()
-        except:
-            self._running = False
+            data = _loads(event.data)
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        return data
+
+    def _handle_message(self, data: dict):
+        if 'method' in data:
+            self._handle_request(data)
             return
-        if not data: return self._stdio_recv()
-        try:
-            data = json.loads(data)
-        except json.JSONDecodeError:
+        msg_id = data.get("id")
+        with self.lock:
+            if msg_id in self.response_queues:
+                self.response_queues[msg_id].put(data)
+            elif msg_id is None and 'error' in data:
+                # 无法对应到具体请求的错误（如无法识别ID的超长消息），让所有等待中的请求失败
+                for q in self.response_queues.values():
+                    q.put(data)
+            elif msg_id is not None:
+                print(f"Unmatched response (id={msg_id})")
+
+    def _handle_request(self, data: dict):
+        """处理服务端主动发来的通知或请求"""
+        method = data['method']
+        if 'id' in data:
+            # 服务端请求：仅支持ping，其余返回方法不存在
+            reply = {"jsonrpc": "2.0", "id": data['id']}
+            if method == 'ping':
+                reply['result'] = {}
+            else:
+                reply['error'] = {"code": -32601, "message": f"Method not found: {method}"}
+            threading.Thread(target=self._send_raw, args=(reply,), daemon=True).start()
             return
-        return data
+        if method in self._INVALIDATES:
+            self._invalidate(self._INVALIDATES[method])
+        elif method == 'notifications/resources/updated':
+            self._invalidate(('resources/read', data.get('params', {}).get('uri')))
+        handlers = list(self._notification_handlers.get(method, []))
+        if handlers:
+            # 在独立线程中执行回调，回调内可以安全地再次调用post
+            threading.Thread(target=self._run_handlers, args=(handlers, data), daemon=True).start()
+
+    def _invalidate(self, key):
+        with self.lock:
+            self._cache_versions[key] = self._cache_versions.get(key, 0) + 1
+            self._cache.pop(key, None)
+
+    def _run_handlers(self, handlers: List[Callable], data: dict):
+        for func in handlers:
+            try:
+                func(data.get('params', {}))
+            except Exception as e:
+                print(f"Notification handler failed ({data['method']}): {e}")
+
+    def on_notification(self, method: str, func: Callable) -> Callable:
+        """注册服务端通知回调
+
+        Args:
+            method: 通知名称，如 notifications/tools/list_changed
+            func: 回调函数，参数为通知的params
+        """
+        self._notification_handlers.setdefault(method, []).append(func)
+        return func
+
+    def _fail_pending(self):
+        error = ConnectionError(f"Connection closed: {self.endpoint}")
+        with self.lock:
+            for q in self.response_queues.values():
+                q.put(error)
+
+    def _stdio_recv_loop(self, stdio: StdioClient):
+        try:
+            for message in stdio.iter_messages():
+                self._handle_message(message)
+        except (OSError, ValueError):
+            pass
+        finally:
+            # 管道已关闭，服务端进程退出；重启后旧的接收线程退出时不影响新进程
+            if stdio is self._stdio:
+                self._running = False
+                self._fail_pending()
+
+    def _send_raw(self, data: dict):
+        try:
+            if self._method == 'stdio':
+                with self._write_lock:
+                    self._stdio.write(data)
+            elif self._method == 'sse':
+                self._http.post(f"{self.base_url}{self.session}", json=data, timeout=self.timeout)
+            elif self._method == 'http':
+                self._http_post(data, False, self.timeout)
+        except (OSError, ValueError, AttributeError, requests.exceptions.RequestException):
+            pass
+
+    def _http_post(self, data: dict, wait_for_response: bool, timeout):
+        """Streamable HTTP：所有消息发往同一端点，响应可能是JSON或SSE流"""
+        headers = {'Accept': 'application/json, text/event-stream'}
+        if self.session:
+            headers['Mcp-Session-Id'] = self.session
+        response = self._http.post(
+            self.endpoint,
+            json=data,
+            headers=headers,
+            stream=True,
+            timeout=(self.timeout, timeout)
+        )
+        with response:
+            if response.headers.get('Mcp-Session-Id'):
+                self.session = response.headers['Mcp-Session-Id']
+            if response.status_code >= 400:
+                error = ConnectionError(f"Request failed: {response.status_code} {response.text}")
+                error.status_code = response.status_code
+                raise error
+            if not wait_for_response:
+                return {"status": "sent", "code": response.status_code}
+
+            content_type = response.headers.get('Content-Type', '')
+            if content_type.startswith('text/event-stream'):
+                # 流式响应：逐块解析，收到对应ID的响应后立即返回
+                parser = SSEParser()
+                for chunk in _iter_stream(response):
+                    for event in parser.feed(chunk):
+                        message = self._parse_event(event)
+                        if not message: continue
+                        if message.get('id') == data['id'] and 'method' not in message:
+                            return message
+                        self._handle_message(message)
+                raise ConnectionError(f"Stream closed before response (id={data['id']})")
+            message = response.json()
+            if isinstance(message, list):
+                message = next((m for m in message if m.get('id') == data['id']), {})
+            return message
 
     def post(self, method=None, params=None, timeout=10, wait_for_response=True):
         self.endpoint_ready.wait()
@@ -130,6 +564,8 @@ class MCPClient:
         # 构造请求数据
         if method is None:
             raise ValueError("Either method or data must be provided")
+        if not self._running:
+            raise ConnectionError(f"Client is not running: {self.endpoint}")
 
         data = {
             "jsonrpc": "2.0",
@@ -145,27 +581,30 @@ class MCPClient:
                 request_id = self._next_id
                 data['id'] = request_id
                 self._next_id += 1
-            with self.lock:
-                self.response_queues[request_id] = queue.Queue()
-
-        # 构建完整URL
-        full_url = f"{self.base_url}{self.session}"
+            if self._method in ('sse', 'stdio'):
+                with self.lock:
+                    self.response_queues[request_id] = queue.Queue()
 
         try:
-            if self._method == 'sse':
-                response = requests.post(
+            if self._method == 'http':
+                return self._http_post(data, wait_for_response, timeout)
+            elif self._method == 'sse':
+                # 构建完整URL
+                full_url = f"{self.base_url}{self.session}"
+                response = self._http.post(
                     full_url,
                     json=data,
-                    timeout=5
+                    timeout=self.timeout
                 )
             elif self._method == 'stdio':
-                self._stdio.stdin.write(json.dumps(data) + '\n')
-                self._stdio.stdin.flush()
-                if wait_for_response:
-                    data = self._stdio_recv()
-                    return data
-                return {"status": "sent"}
-        except requests.exceptions.RequestException as e:
+                with self._write_lock:
+                    self._stdio.write(data)
+                if not wait_for_response:
+                    return {"status": "sent"}
+        except (requests.exceptions.RequestException, OSError, ValueError, AttributeError) as e:
+            if wait_for_response and self._method in ('sse', 'stdio'):
+                with self.lock:
+                    self.response_queues.pop(request_id, None)
             raise ConnectionError(f"Request failed: {str(e)}")
 
         if not wait_for_response:
@@ -186,13 +625,107 @@ class MCPClient:
                 if request_id in self.response_queues:
                     del self.response_queues[request_id]
 
+        if isinstance(response_data, Exception):
+            raise response_data
         return response_data
     
-    def list_tools(self): # 列出所有工具
-        return self.post(
-            method="tools/list",
-            params={}
-        ).get('result', {}).get("tools", [])
+    def list_tools(self, refresh: bool=False): # 列出所有工具
+        """列出所有工具，结果会被缓存，直到服务端发出 tools/list_changed 通知
+
+        Args:
+            refresh: 是否忽略缓存重新获取
+        """
+        return self._list_all("tools/list", "tools", refresh)
+
+    def _list_all(self, method: str, field: str, refresh: bool=False) -> list:
+        items = self._cache.get(method)
+        if items is not None and not refresh:
+            return list(items)
+        version = self._cache_versions.get(method, 0)
+        items = []
+        cursor = None
+        while True:
+            # 按nextCursor分页获取，避免大型服务端的列表被截断
+            result = self.post(
+                method=method,
+                params={"cursor": cursor} if cursor else {}
+            ).get('result', {})
+            items.extend(result.get(field, []))
+            cursor = result.get("nextCursor")
+            if not cursor: break
+        with self.lock:
+            if version == self._cache_versions.get(method, 0):
+                self._cache[method] = items
+        return list(items)
+
+    def list_resources(self, refresh: bool=False) -> list:
+        """列出所有资源，结果会被缓存，直到服务端发出 resources/list_changed 通知"""
+        return self._list_all("resources/list", "resources", refresh)
+
+    def read_resource(self, uri: str, refresh: bool=False) -> list:
+        """读取资源内容
+
+        服务端支持订阅时，首次读取前会订阅该资源，之后直接返回本地缓存，
+        直到收到 resources/updated 通知；不支持订阅时每次都重新读取。
+
+        Args:
+            uri: 资源URI
+            refresh: 是否忽略缓存重新读取
+
+        Returns:
+            资源的contents列表
+        """
+        key = ('resources/read', uri)
+        contents = self._cache.get(key)
+        if contents is not None and not refresh:
+            return contents
+        cacheable = bool(self.server_capabilities.get('resources', {}).get('subscribe'))
+        if cacheable and uri not in self._subscriptions:
+            # 先订阅再读取，避免错过两者之间发生的更新
+            response = self.post(method="resources/subscribe", params={"uri": uri})
+            if 'error' in response:
+                cacheable = False
+            else:
+                self._subscriptions.add(uri)
+        version = self._cache_versions.get(key, 0)
+        response = self.post(method="resources/read", params={"uri": uri})
+        if 'error' in response:
+            raise ValueError(f"Failed to read resource {uri}: {response['error'].get('message')}")
+        contents = response.get('result', {}).get('contents', [])
+        if cacheable:
+            with self.lock:
+                if version == self._cache_versions.get(key, 0):
+                    self._cache[key] = contents
+        return contents
+
+    def unsubscribe_resource(self, uri: str) -> None:
+        """取消订阅资源并丢弃其缓存"""
+        self._invalidate(('resources/read', uri))
+        if uri in self._subscriptions:
+            self._subscriptions.discard(uri)
+            self.post(method="resources/unsubscribe", params={"uri": uri})
+
+    def list_prompts(self, refresh: bool=False) -> list:
+        """列出所有提示词模板，结果会被缓存，直到服务端发出 prompts/list_changed 通知"""
+        return self._list_all("prompts/list", "prompts", refresh)
+
+    def get_prompt(self, name: str, arguments: dict=None) -> dict:
+        """获取提示词
+
+        Args:
+            name: 提示词名称
+            arguments: 提示词参数
+
+        Returns:
+            包含description和messages的字典
+        """
+        response = self.post(
+            method="prompts/get",
+            params={"name": name, "arguments": arguments or {}}
+        )
+        if 'error' in response:
+            raise ValueError(f"Failed to get prompt {name}: {response['error'].get('message')}")
+        return response.get('result', {})
     
     def call_tool(self, tool_name, input_data: dict={}):
         return self.post(
@@ -204,15 +737,269 @@ class MCPClient:
             timeout=None
         )
 
+    def ping(self, timeout: float=5) -> bool:
+        """检查服务端是否存活"""
+        if not self._running:
+            return False
+        if self._stdio and not self._stdio.alive:
+            return False
+        try:
+            response = self.post(method="ping", timeout=timeout)
+        except (ConnectionError, TimeoutError):
+            return False
+        # 即使服务端不支持ping而返回错误，也说明进程仍在响应
+        return isinstance(response, dict)
+
+    def restart(self) -> bool:
+        """关闭当前连接（stdio会结束子进程）并重新连接、初始化
+
+        Returns:
+            是否重启成功
+        """
+        self.close()
+        try:
+            return self.connect()
+        except Exception:
+            self._running = False
+            return False
+
     def close(self):
         self._running = False
+        if self._http:
+            if self._method == 'http' and self.session:
+                # 通知服务端结束会话
+                try:
+                    self._http.delete(self.endpoint, headers={'Mcp-Session-Id': self.session}, timeout=self.timeout)
+                except requests.exceptions.RequestException:
+                    pass
+            self._http.close()
+            self._http = None
+        if self._stdio:
+            self._stdio.close()
+            self._stdio = None
+        self._fail_pending()
     
 
+class MCPPool:
+    def __init__(self, endpoint:str|list, replicas:int=2, max_replicas:int=None, scale_up_at:int=1, idle_timeout:float=60, name='mcp', version='0.1.0'):
+        """同一stdio服务的多个副本，对外表现为一个服务器，调用会路由到负载最低的副本
+
+        Args:
+            endpoint: stdio命令
+            replicas: 最少保持的副本数
+            max_replicas: 最多副本数，为空时等于replicas（不自动扩容）
+            scale_up_at: 单个副本的在途请求上限；所有副本都达到时扩容，调用排队等待空闲副本（包括新启动的副本）
+            idle_timeout: 超出最少副本数的空闲副本在空闲多久后关闭（秒），由后台线程定期检查
+            name: 客户端名称
+            version: 客户端版本
+        """
+        if isinstance(endpoint, list):
+            endpoint = ' '.join(endpoint)
+        self.endpoint = endpoint
+        self.client_name = name
+        self.client_version = version
+        self.min_replicas = max(replicas, 1)
+        self.max_replicas = max(max_replicas or replicas, self.min_replicas)
+        self.scale_up_at = scale_up_at
+        self.idle_timeout = idle_timeout
+        self.server_name = None
+        self.server_version = None
+        self._stdio = None
+        self._replicas: List[MCPClient] = []
+        self._load: Dict[MCPClient, int] = {}
+        self._last_used: Dict[MCPClient, float] = {}
+        self._spawning = 0
+        self._spawn_failed = 0.0
+        self._reaper = None
+        self._closed = threading.Event()
+        self._notification_handlers: Dict[str, List[Callable]] = {}
+        self.lock = threading.Lock()
+        self._available = threading.Condition(self.lock)
+
+        with ThreadPoolExecutor(max_workers=self.min_replicas) as executor:
+            clients = list(executor.map(lambda _: self._new_replica(), range(self.min_replicas)))
+        for client in clients:
+            if client: self._add_replica(client)
+        if self._replicas:
+            self.server_name = self._replicas[0].server_name
+            self.server_version = self._replicas[0].server_version
+
+    @property
+    def _running(self) -> bool:
+        return any(client._running for client in self._replicas)
+
+    @property
+    def replicas(self) -> int:
+        return len(self._replicas)
+
+    def _new_replica(self) -> Optional[MCPClient]:
+        try:
+            client = MCPClient(self.endpoint, name=self.client_name, version=self.client_version, transport='stdio')
+        except Exception:
+            return None
+        if not client._running:
+            client.close()
+            return None
+        return client
+
+    def _add_replica(self, client: MCPClient):
+        for method, handlers in self._notification_handlers.items():
+            for func in handlers:
+                client.on_notification(method, func)
+        with self.lock:
+            self._replicas.append(client)
+            self._load[client] = 0
+            self._last_used[client] = time.monotonic()
+            if len(self._replicas) > self.min_replicas and self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap, daemon=True)
+                self._reaper.start()
+            self._available.notify_all()
+
+    def _scale_up(self):
+        client = self._new_replica()
+        if client:
+            self._add_replica(client)
+        with self.lock:
+            self._spawning -= 1
+            if not client: self._spawn_failed = time.monotonic()
+            self._available.notify_all()
+
+    def _reap(self):
+        # 有超出最少数量的副本时定期回收空闲副本，池子空闲时也会缩容
+        while not self._closed.wait(min(self.idle_timeout, 5)):
+            self._scale_down()
+            with self.lock:
+                if len(self._replicas) <= self.min_replicas:
+                    self._reaper = None
+                    return
+
+    def _scale_down(self):
+        now = time.monotonic()
+        idle = []
+        with self.lock:
+            for client in reversed(self._replicas):
+                if len(self._replicas) - len(idle) <= self.min_replicas:
+                    break
+                if self._load[client] == 0 and now - self._last_used[client] > self.idle_timeout:
+                    idle.append(client)
+            for client in idle:
+                self._replicas.remove(client)
+                self._load.pop(client, None)
+                self._last_used.pop(client, None)
+        for client in idle:
+            client.close()
+
+    def _acquire(self) -> MCPClient:
+        # 所有副本都已繁忙时在后台扩容，并等待任一副本空出（包括新启动的副本），排队的调用不会绑定在已有副本上
+        with self.lock:
+            while True:
+                running = [client for client in self._replicas if client._running]
+                if not running and not self._spawning:
+                    raise ConnectionError(f"No running replica: {self.endpoint}")
+                client = min(running, key=lambda c: self._load[c]) if running else None
+                if client and self._load[client] < self.scale_up_at:
+                    break
+                # 刚启动失败时短时间内不再重试，避免不断拉起失败的进程
+                if len(self._replicas) + self._spawning < self.max_replicas and time.monotonic() - self._spawn_failed > 5:
+                    self._spawning += 1
+                    threading.Thread(target=self._scale_up, daemon=True).start()
+                elif client and not self._spawning:
+                    # 已达到副本上限，排到负载最低的副本
+                    break
+                self._available.wait(timeout=1)
+            self._load[client] += 1
+            return client
+
+    def _release(self, client: MCPClient):
+        with self.lock:
+            if client in self._load:
+                self._load[client] -= 1
+                self._last_used[client] = time.monotonic()
+            self._available.notify()
+
+    def list_tools(self, refresh: bool=False):
+        client = self._acquire()
+        try:
+            return client.list_tools(refresh=refresh)
+        finally:
+            self._release(client)
+
+    def call_tool(self, tool_name, input_data: dict={}):
+        client = self._acquire()
+        try:
+            return client.call_tool(tool_name, input_data)
+        finally:
+            self._release(client)
+
+    def _primary(self) -> MCPClient:
+        # 资源与提示词固定走同一个副本，使其缓存和订阅只需维护一份
+        for client in list(self._replicas):
+            if client._running:
+                return client
+        raise ConnectionError(f"No running replica: {self.endpoint}")
+
+    def list_resources(self, refresh: bool=False) -> list:
+        return self._primary().list_resources(refresh=refresh)
+
+    def read_resource(self, uri: str, refresh: bool=False) -> list:
+        return self._primary().read_resource(uri, refresh=refresh)
+
+    def unsubscribe_resource(self, uri: str) -> None:
+        return self._primary().unsubscribe_resource(uri)
+
+    def list_prompts(self, refresh: bool=False) -> list:
+        return self._primary().list_prompts(refresh=refresh)
+
+    def get_prompt(self, name: str, arguments: dict=None) -> dict:
+        return self._primary().get_prompt(name, arguments)
+
+    def on_notification(self, method: str, func: Callable) -> Callable:
+        self._notification_handlers.setdefault(method, []).append(func)
+        for client in list(self._replicas):
+            client.on_notification(method, func)
+        return func
+
+    def ping(self, timeout: float=5) -> bool:
+        """所有副本都存活时返回True；有在途调用的副本可能无法及时响应ping，只检查其进程是否仍在运行"""
+        replicas = list(self._replicas)
+        return bool(replicas) and all(
+            client._running and client._stdio.alive if self._load.get(client) else client.ping(timeout)
+            for client in replicas
+        )
+
+    def restart(self) -> bool:
+        """重启已退出或失去响应的副本，并补足最少副本数"""
+        for client in list(self._replicas):
+            exited = not client._running or (client._stdio and not client._stdio.alive)
+            # 单线程服务端处理请求时无法响应ping，有在途调用的副本只在进程退出时重启
+            if exited or (not self._load.get(client) and not client.ping(timeout=1)):
+                client.restart()
+        while len(self._replicas) < self.min_replicas:
+            client = self._new_replica()
+            if not client: break
+            self._add_replica(client)
+        if self._running and not self.server_name:
+            self.server_name = self._replicas[0].server_name
+        if self._running:
+            self.server_version = next(c for c in self._replicas if c._running).server_version
+        return self._running
+
+    def close(self):
+        self._closed.set()
+        with self.lock:
+            replicas = self._replicas
+            self._replicas = []
+            self._load = {}
+            self._last_used = {}
+        for client in replicas:
+            client.close()
+
+
 class MCPGroup:
     def __init__(self):
         from .identify import Identify
         """初始化MCPGroup，管理多个MCPClient实例"""
-        self._clients: Dict[str, MCPClient] = {}
+        self._clients: Dict[str, Union[MCPClient, MCPPool]] = {}
         self._bound_identify: Optional[Identify] = None
     
     def add_client(self, client: Union[MCPClient, str, list]) -> None:
@@ -227,12 +1014,86 @@ class MCPGroup:
             except:
                 print(f"Failed to create client: {client}")
                 return
-        
+        self._register(client)
+
+    def add_pool(self, endpoint: Union[str, list], replicas: int=2, max_replicas: int=None, scale_up_at: int=1, idle_timeout: float=60) -> Optional[MCPPool]:
+        """以多个副本运行同一个stdio服务，在组内作为一个服务器注册
+
+        Args:
+            endpoint: stdio命令
+            replicas: 最少保持的副本数
+            max_replicas: 最多副本数，为空时不自动扩容
+            scale_up_at: 所有副本的在途请求数都达到该值时扩容
+            idle_timeout: 多余空闲副本的关闭时间（秒）
+
+        Returns:
+            MCPPool实例，启动失败时返回None
+        """
+        pool = MCPPool(endpoint, replicas=replicas, max_replicas=max_replicas, scale_up_at=scale_up_at, idle_timeout=idle_timeout)
+        if not pool._running:
+            print(f"Failed to create client: {pool.endpoint}")
+            return None
+        self._register(pool)
+        return pool
+
+    def add_clients(self, clients: List[Union[MCPClient, str, list]], timeout: float = 30) -> Dict[str, str]:
+        """并发启动并初始化多个MCPClient，超时或失败的服务器不会阻塞其余服务器
+
+        Args:
+            clients: MCPClient实例或endpoint字符串或命令参数的列表
+            timeout: 每个服务器完成连接（以及已绑定时获取工具列表）的最长时间（秒）
+
+        Returns:
+            失败的服务器，键为endpoint，值为失败原因
+        """
+        pending: Dict[Future, MCPClient] = {}
+        failures: Dict[str, str] = {}
+        bound = self._bound_identify is not None
+
+        def start(client: MCPClient):
+            if not client._running and not client.connect():
+                raise ConnectionError("initialize failed")
+            # 已绑定Identify时顺便并发获取工具列表
+            return client.list_tools() if bound else None
+
+        executor = ThreadPoolExecutor(max_workers=max(len(clients), 1))
+        for client in clients:
+            endpoint = ' '.join(client) if isinstance(client, list) else getattr(client, 'endpoint', client)
+            try:
+                if not isinstance(client, MCPClient):
+                    client = MCPClient(endpoint=client, connect=False)
+            except Exception as e:
+                failures[endpoint] = str(e)
+                continue
+            pending[executor.submit(start, client)] = client
+        done, not_done = wait(pending, timeout=timeout)
+        executor.shutdown(wait=False)
+
+        for future in not_done:
+            # 关闭超时的客户端，结束子进程并中断仍在阻塞的握手
+            client = pending[future]
+            client.close()
+            failures[client.endpoint] = f"timeout after {timeout}s"
+
+        for future in done:
+            client = pending[future]
+            try:
+                tools = future.result()
+                self._register(client, tools=tools)
+            except Exception as e:
+                client.close()
+                failures[client.endpoint] = str(e) or type(e).__name__
+
+        for endpoint, reason in failures.items():
+            print(f"Failed to create client: {endpoint} ({reason})")
+        return failures
+
+    def _register(self, client: Union[MCPClient, MCPPool], tools: list = None) -> None:
         if client._running is False:
             raise ValueError("client is not running")
         
-        if not isinstance(client, MCPClient):
-            raise TypeError("client must be an instance of MCPClient or a string")
+        if not isinstance(client, (MCPClient, MCPPool)):
+            raise TypeError("client must be an instance of MCPClient, MCPPool or a string")
             
         if not client.server_name:
             raise ValueError("client.server_name is not set")
@@ -246,7 +1107,7 @@ class MCPGroup:
         
         # 自动绑定到已绑定的Identify实例
         if self._bound_identify:
-            self._bound_identify.add_mcp(client)
+            self._bound_identify.add_mcp(client, tools=tools)
     
     def remove_client(self, name: str) -> None:
         """从组中移除一个MCPClient
@@ -260,7 +1121,7 @@ class MCPGroup:
                 self._bound_identify.remove_mcp(name)
             del self._clients[name]
     
-    def req_client(self, name: str) -> Optional[MCPClient]:
+    def req_client(self, name: str) -> Optional[Union[MCPClient, MCPPool]]:
         """获取指定名称的MCPClient
         
         Args:
@@ -285,4 +1146,104 @@ class MCPGroup:
             
         self._bound_identify = identify
         for client in self._clients.values():
-            identify.add_mcp(client)
\ No newline at end of file
+            identify.add_mcp(client)
+    
+    def supervise(self, interval: float=30, timeout: float=5, max_missed: int=3, backoff: float=1, max_backoff: float=60) -> 'MCPSupervisor':
+        """启动后台健康检查，自动重启已退出或失去响应的服务器
+
+        Args:
+            interval: 健康检查间隔（秒）
+            timeout: 单次ping超时（秒）
+            max_missed: 连续多少次ping失败后判定为失去响应
+            backoff: 重启失败后的初始重试间隔（秒），之后按指数增长
+            max_backoff: 重试间隔上限（秒）
+
+        Returns:
+            已启动的MCPSupervisor实例
+        """
+        supervisor = MCPSupervisor(self, interval=interval, timeout=timeout, max_missed=max_missed, backoff=backoff, max_backoff=max_backoff)
+        supervisor.start()
+        return supervisor
+
+
+class MCPSupervisor:
+    def __init__(self, group: MCPGroup, interval: float=30, timeout: float=5, max_missed: int=3, backoff: float=1, max_backoff: float=60):
+        """定期ping组内的所有服务器，按指数退避重启失效的服务器，并重新注册其工具"""
+        self.group = group
+        self.interval = interval
+        self.timeout = timeout
+        self.max_missed = max_missed
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._state: Dict[str, dict] = {}
+        self._stop = threading.Event()
+        self._thread: threading.Thread = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.check()
+            now = time.monotonic()
+            next_check = min([state['next_check'] for state in self._state.values()] + [now + self.interval])
+            self._stop.wait(max(next_check - now, 0.1))
+
+    def check(self) -> None:
+        """检查所有到期的服务器"""
+        for name, client in list(self.group._clients.items()):
+            if self._stop.is_set(): break
+            self._check_client(name, client)
+        for name in list(self._state):
+            if name not in self.group._clients:
+                del self._state[name]
+
+    @staticmethod
+    def _busy(client: Union[MCPClient, MCPPool]) -> bool:
+        if isinstance(client, MCPPool):
+            return any(client._load.values())
+        return bool(client.response_queues)
+
+    def _check_client(self, name: str, client: Union[MCPClient, MCPPool]):
+        state = self._state.setdefault(name, {'missed': 0, 'failures': 0, 'next_check': 0})
+        now = time.monotonic()
+        if now < state['next_check']:
+            return
+
+        if client._running:
+            if client.ping(self.timeout):
+                state['missed'] = 0
+                state['next_check'] = now + self.interval
+                return
+            if self._busy(client) and (not client._stdio or client._stdio.alive):
+                # 单线程服务端处理请求时无法响应ping，有在途请求时超时不计为失联
+                state['next_check'] = now + self.interval
+                return
+            state['missed'] += 1
+            if state['missed'] < self.max_missed and (not client._stdio or client._stdio.alive):
+                state['next_check'] = now + self.interval
+                return
+
+        if client.restart():
+            print(f'Restarted MCP: {name} ({client.server_version})')
+            state.update(missed=0, failures=0, next_check=time.monotonic() + self.interval)
+            identify = self.group._bound_identify
+            if identify:
+                try:
+                    identify.add_mcp(client, tools=client.list_tools(refresh=True))
+                except Exception as e:
+                    print(f"Failed to reload tools from {name}: {e}")
+            return
+
+        state['failures'] += 1
+        delay = min(self.backoff * 2 ** (state['failures'] - 1), self.max_backoff)
+        state['next_check'] = time.monotonic() + delay
+        detail = f": {client._stdio.stderr_tail[-1]}" if client._stdio and client._stdio.stderr_tail else ''
+        print(f"Failed to restart MCP: {name}, retry in {delay}s{detail}")
@@ -0,0 +1,427 @@
+from typing       import Any, Dict, List, Optional, Union
+from urllib.parse import urlparse
+from .mcp         import SSEParser, _Framer, _loads, _dumps
+import asyncio
+
+
+class AsyncMCPClient:
+    def __init__(self, endpoint:str|list, name='mcp', version='0.1.0', transport:str=None, max_message_size:int=64 * 1024 * 1024):
+        """异步MCP客户端，接口与MCPClient一致，需要 await start() 后才能使用
+
+        Args:
+            endpoint: 服务地址或stdio命令
+            name: 客户端名称
+            version: 客户端版本
+            transport: 传输方式 'stdio' / 'sse' / 'http'，为空时根据endpoint自动判断
+            max_message_size: stdio单条消息的最大字节数，超出的响应会以错误返回
+        """
+        if isinstance(endpoint, list):
+            endpoint = ' '.join(endpoint)
+        self._method: str = None
+        self._transport_fixed = transport is not None
+        self.client_name = name
+        self.client_version = version
+        self.server_name = None
+        self.server_version = None
+        self.base_url = self._parse_base_url(endpoint, transport)
+        self.session = None
+        self.endpoint = endpoint
+        self.max_message_size = max_message_size
+        self.endpoint_ready: asyncio.Event = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._running = False
+        self._next_id = 0
+        self._process: asyncio.subprocess.Process = None
+        self._write_lock: asyncio.Lock = None
+        self._http = None
+        self._tasks: List[asyncio.Task] = []
+
+    @classmethod
+    async def create(cls, endpoint:str|list, name='mcp', version='0.1.0', transport:str=None, max_message_size:int=64 * 1024 * 1024) -> 'AsyncMCPClient':
+        client = cls(endpoint, name=name, version=version, transport=transport, max_message_size=max_message_size)
+        await client.start()
+        return client
+
+    async def __aenter__(self):
+        if not self._running:
+            await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _parse_base_url(self, endpoint, transport=None):
+        """从endpoint解析基础URL"""
+        if transport == 'stdio' or (transport is None and not 'http' in endpoint):
+            self._method = 'stdio'
+            return ''
+        parsed = urlparse(endpoint)
+        if transport:
+            self._method = transport
+        else:
+            self._method = 'sse' if parsed.path.rstrip('/').endswith('/sse') else 'http'
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    async def start(self, timeout=10):
+        """建立连接并完成initialize握手"""
+        self.endpoint_ready = asyncio.Event()
+        self._write_lock = asyncio.Lock()
+        self._running = True
+        try:
+            if self._method == 'stdio':
+                self._process = await asyncio.create_subprocess_exec(
+                    *self.endpoint.split(' '),
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                self._tasks.append(asyncio.create_task(self._stdio_recv_loop()))
+                self._tasks.append(asyncio.create_task(self._drain_stderr()))
+                self.endpoint_ready.set()
+            elif self._method == 'sse':
+                import aiohttp
+                self._http = aiohttp.ClientSession()
+                self._tasks.append(asyncio.create_task(self._sse_recv_loop()))
+                await asyncio.wait_for(self.endpoint_ready.wait(), timeout)
+            elif self._method == 'http':
+                import aiohttp
+                self._http = aiohttp.ClientSession()
+                self.endpoint_ready.set()
+            await self._init_client(timeout)
+        except Exception as e:
+            await self.close()
+            raise ConnectionError(f"Failed to start client: {self.endpoint} ({e})") from e
+        return self
+
+    async def _init_client(self, timeout=10):
+        try:
+            data = await self._initialize(timeout)
+        except ConnectionError as e:
+            # 未指定传输方式时，不支持Streamable HTTP的服务端回退到旧版SSE
+            if self._method != 'http' or self._transport_fixed or getattr(e, 'status_code', None) not in (400, 404, 405):
+                raise
+            self._method = 'sse'
+            self.endpoint_ready.clear()
+            self._tasks.append(asyncio.create_task(self._sse_recv_loop()))
+            await asyncio.wait_for(self.endpoint_ready.wait(), timeout)
+            data = await self._initialize(timeout)
+        data = data.get('result', {}).get("serverInfo", {})
+        self.server_name = data.get("name")
+        self.server_version = data.get("version")
+        await self.post(
+            method="notifications/initialized",
+            wait_for_response=False
+        )
+
+    async def _initialize(self, timeout=10) -> dict:
+        return await self.post(
+            method="initialize",
+            params={
+                "protocolVersion": "2025-03-26" if self._method == 'http' else "2024-11-05",
+                "capabilities": {},
+                "clientInfo": {
+                    "name": self.client_name,
+                    "version": self.client_version,
+                }
+            },
+            timeout=timeout
+        )
+
+    def _dispatch(self, data: dict):
+        if 'method' in data:
+            self._handle_request(data)
+            return
+        msg_id = data.get("id")
+        if msg_id is None and 'error' in data:
+            # 无法对应到具体请求的错误（如无法识别ID的超长消息），让所有等待中的请求失败
+            for future in self._pending.values():
+                if not future.done(): future.set_result(data)
+            return
+        future = self._pending.get(msg_id)
+        if future is None:
+            if msg_id is not None:
+                print(f"Unmatched response (id={msg_id})")
+            return
+        if not future.done():
+            future.set_result(data)
+
+    def _handle_request(self, data: dict):
+        """处理服务端主动发来的请求：仅支持ping，其余返回方法不存在；通知直接忽略"""
+        if 'id' not in data:
+            return
+        reply = {"jsonrpc": "2.0", "id": data['id']}
+        if data['method'] == 'ping':
+            reply['result'] = {}
+        else:
+            reply['error'] = {"code": -32601, "message": f"Method not found: {data['method']}"}
+        task = asyncio.create_task(self._reply(reply))
+        self._tasks.append(task)
+        task.add_done_callback(lambda t: t in self._tasks and self._tasks.remove(t))
+
+    async def _reply(self, data: dict):
+        try:
+            await self._send(data)
+        except Exception:
+            pass
+
+    def _fail_pending(self, error: Exception):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    async def _stdio_recv_loop(self):
+        # 按块读取而不是readline，超长消息按max_message_size丢弃并返回错误，不会中断整个连接
+        framer = _Framer(self.max_message_size, self.endpoint)
+        try:
+            while self._running:
+                chunk = await self._process.stdout.read(65536)
+                if not chunk: break
+                for data in framer.feed(chunk):
+                    self._dispatch(data)
+        except (asyncio.CancelledError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._running = False
+            self._fail_pending(ConnectionError(f"Connection closed: {self.endpoint}"))
+
+    async def _drain_stderr(self):
+        # 持续读取stderr，避免输出过多时管道写满导致服务端阻塞
+        try:
+            while await self._process.stderr.read(65536):
+                pass
+        except asyncio.CancelledError:
+            pass
+
+    async def _sse_recv_loop(self):
+        parser = SSEParser()
+        try:
+            async with self._http.get(self.endpoint, headers={'Accept': 'text/event-stream'}) as response:
+                async for chunk in response.content.iter_any():
+                    for event in parser.feed(chunk):
+                        if event.event == 'endpoint' or 'session_id' in event.data:
+                            self.session = event.data
+                            self.endpoint_ready.set()
+                            continue
+                        self._dispatch_event(event.data)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"SSE connection lost: {self.endpoint} ({e})")
+        finally:
+            self._running = False
+            self._fail_pending(ConnectionError(f"Connection closed: {self.endpoint}"))
+
+    def _dispatch_event(self, text: str):
+        try:
+            data = _loads(text)
+        except ValueError:
+            return
+        for message in data if isinstance(data, list) else [data]:
+            if isinstance(message, dict):
+                self._dispatch(message)
+
+    async def _send(self, data: dict):
+        if self._method == 'stdio':
+            async with self._write_lock:
+                self._process.stdin.write(_dumps(data) + b'\n')
+                await self._process.stdin.drain()
+            return None
+        if self._method == 'http':
+            return await self._http_send(data)
+        full_url = f"{self.base_url}{self.session}"
+        async with self._http.post(full_url, json=data) as response:
+            if response.status >= 400:
+                raise ConnectionError(f"Request failed: {response.status} {await response.text()}")
+            return response.status
+
+    async def _http_send(self, data: dict):
+        """Streamable HTTP：响应为JSON或SSE流，收到的消息按ID分发给等待中的请求"""
+        headers = {'Accept': 'application/json, text/event-stream'}
+        if self.session:
+            headers['Mcp-Session-Id'] = self.session
+        async with self._http.post(self.endpoint, json=data, headers=headers) as response:
+            if response.headers.get('Mcp-Session-Id'):
+                self.session = response.headers['Mcp-Session-Id']
+            if response.status >= 400:
+                error = ConnectionError(f"Request failed: {response.status} {await response.text()}")
+                error.status_code = response.status
+                raise error
+            if response.content_type == 'text/event-stream':
+                parser = SSEParser()
+                async for chunk in response.content.iter_any():
+                    for event in parser.feed(chunk):
+                        self._dispatch_event(event.data)
+            elif response.content_type == 'application/json':
+                self._dispatch_event(await response.text())
+            return response.status
+
+    async def post(self, method=None, params=None, timeout=10, wait_for_response=True):
+        await self.endpoint_ready.wait()
+
+        if method is None:
+            raise ValueError("Either method or data must be provided")
+        if not self._running:
+            raise ConnectionError(f"Client is not running: {self.endpoint}")
+
+        data = {
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params or {}
+        }
+
+        if not wait_for_response:
+            code = await self._send(data)
+            return {"status": "sent", "code": code} if code else {"status": "sent"}
+
+        # 按ID复用同一连接，多个请求可以同时在途
+        request_id = self._next_id
+        self._next_id += 1
+        data['id'] = request_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await self._send(data)
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Response timeout (id={request_id})")
+        except ConnectionError:
+            raise
+        except OSError as e:
+            raise ConnectionError(f"Request failed: {str(e)}") from e
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def list_tools(self): # 列出所有工具
+        data = await self.post(
+            method="tools/list",
+            params={}
+        )
+        return data.get('result', {}).get("tools", [])
+
+    async def call_tool(self, tool_name, input_data: dict=None):
+        return await self.post(
+            method="tools/call",
+            params={
+                "name": tool_name,
+                "arguments": input_data or {}
+            },
+            timeout=None
+        )
+
+    async def close(self):
+        self._running = False
+        for task in self._tasks:
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._process and self._process.returncode is None:
+            try:
+                self._process.kill()
+                await self._process.wait()
+            except ProcessLookupError:
+                pass
+        if self._http:
+            if self._method == 'http' and self.session:
+                # 通知服务端结束会话
+                try:
+                    await self._http.delete(self.endpoint, headers={'Mcp-Session-Id': self.session})
+                except Exception:
+                    pass
+            await self._http.close()
+            self._http = None
+        self._fail_pending(ConnectionError(f"Client closed: {self.endpoint}"))
+
+
+class AsyncMCPGroup:
+    def __init__(self):
+        """初始化AsyncMCPGroup，管理多个AsyncMCPClient实例"""
+        self._clients: Dict[str, AsyncMCPClient] = {}
+        self._tools: Dict[str, str] = {}  # 工具名 -> 服务器名
+
+    async def add_client(self, client: Union[AsyncMCPClient, str, list]) -> None:
+        """添加一个AsyncMCPClient到组中，未启动的客户端会先启动
+
+        Args:
+            client: AsyncMCPClient实例或endpoint字符串或命令参数
+        """
+        if isinstance(client, str) or isinstance(client, list):
+            try:
+                client = await AsyncMCPClient.create(endpoint=client)
+            except Exception:
+                print(f"Failed to create client: {client}")
+                return
+
+        if not isinstance(client, AsyncMCPClient):
+            raise TypeError("client must be an instance of AsyncMCPClient or a string")
+
+        if client._running is False:
+            await client.start()
+
+        if not client.server_name:
+            raise ValueError("client.server_name is not set")
+
+        if client.server_name in self._clients:
+            raise ValueError(f"client with server_name '{client.server_name}' already exists")
+
+        print(f'Connected to MCP: {client.server_name} ({client.server_version})')
+
+        self._clients[client.server_name] = client
+
+    async def remove_client(self, name: str) -> None:
+        """从组中移除并关闭一个AsyncMCPClient
+
+        Args:
+            name: 要移除的客户端名称
+        """
+        client = self._clients.pop(name, None)
+        if client:
+            self._tools = {k: v for k, v in self._tools.items() if v != name}
+            await client.close()
+
+    def req_client(self, name: str) -> Optional[AsyncMCPClient]:
+        """获取指定名称的AsyncMCPClient
+
+        Args:
+            name: 客户端名称
+
+        Returns:
+            AsyncMCPClient实例，如果不存在则返回None
+        """
+        return self._clients.get(name)
+
+    async def list_tools(self) -> List[dict]:
+        """并发列出所有服务器的工具，并刷新工具名到服务器的映射"""
+        names = list(self._clients)
+        results = await asyncio.gather(
+            *(self._clients[name].list_tools() for name in names),
+            return_exceptions=True
+        )
+        tools = []
+        self._tools = {}
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                print(f"Failed to list tools from {name}: {result}")
+                continue
+            for tool in result:
+                self._tools[tool['name']] = name
+                tools.append(tool)
+        return tools
+
+    async def call_tool(self, tool_name: str, input_data: dict=None) -> Any:
+        """按工具名路由到对应服务器调用
+
+        Args:
+            tool_name: 工具名称
+            input_data: 工具参数
+        """
+        if tool_name not in self._tools:
+            await self.list_tools()
+        if tool_name not in self._tools:
+            raise ValueError(f"Tool '{tool_name}' not found")
+        return await self._clients[self._tools[tool_name]].call_tool(tool_name, input_data)
+
+    async def close(self) -> None:
+        await asyncio.gather(*(client.close() for client in self._clients.values()), return_exceptions=True)
+        self._clients = {}
+        self._tools = {}
@@ -0,0 +1,241 @@
+from concurrent.futures import ThreadPoolExecutor
+from http.server        import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing             import Any, Optional, Union
+from .identify          import Identify, Mind, to_dict_recursive
+from .mcp               import _loads, _dumps
+import importlib
+import threading
+import argparse
+import uuid
+import json
+import sys
+
+
+SUPPORTED_PROTOCOLS = ['2025-03-26', '2024-11-05']
+
+
+class MCPServer:
+    def __init__(self, identify: Union[Identify, Mind], name: str='dlso', version: str='0.0.1', workers: int=8):
+        """将Identify中注册的函数作为MCP工具对外提供
+
+        Args:
+            identify: Identify或Mind实例
+            name: 服务器名称
+            version: 服务器版本
+            workers: 并发执行工具调用的线程数
+        """
+        if isinstance(identify, Mind):
+            identify = identify.idf
+        if not isinstance(identify, Identify):
+            raise TypeError("identify must be an instance of Identify or Mind")
+        self.identify = identify
+        self.name = name
+        self.version = version
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mcp-tool')
+
+    def list_tools(self) -> list:
+        """根据req_info生成MCP工具描述"""
+        tools = []
+        for info in self.identify.req_info():
+            function = info['function']
+            tools.append({
+                'name': function['name'],
+                'description': function.get('description', ''),
+                'inputSchema': function.get('parameters', {'type': 'object', 'properties': {}}),
+            })
+        return tools
+
+    def call_tool(self, name: str, arguments: dict=None) -> dict:
+        """执行工具并转换为MCP的tools/call结果，执行出错时返回isError结果"""
+        entry = self.identify._map.get(name)
+        if entry is None:
+            return self._tool_result(f"Unknown tool: {name}", is_error=True)
+        try:
+            result = entry['original_function'](**(arguments or {}))
+        except Exception as e:
+            return self._tool_result(f"{type(e).__name__}: {e}", is_error=True)
+        result = to_dict_recursive(result)
+        if not isinstance(result, str):
+            result = '' if result is None else json.dumps(result, ensure_ascii=False, default=str)
+        return self._tool_result(result)
+
+    @staticmethod
+    def _tool_result(text: str, is_error: bool=False) -> dict:
+        return {'content': [{'type': 'text', 'text': text}], 'isError': is_error}
+
+    def handle(self, message: dict) -> Optional[dict]:
+        """同步处理一条JSON-RPC消息，通知返回None"""
+        method = message.get('method')
+        msg_id = message.get('id')
+        params = message.get('params') or {}
+        if msg_id is None:
+            return None
+        if method == 'initialize':
+            requested = params.get('protocolVersion')
+            result = {
+                'protocolVersion': requested if requested in SUPPORTED_PROTOCOLS else SUPPORTED_PROTOCOLS[0],
+                'capabilities': {'tools': {'listChanged': False}},
+                'serverInfo': {'name': self.name, 'version': self.version},
+            }
+        elif method == 'ping':
+            result = {}
+        elif method == 'tools/list':
+            result = {'tools': self.list_tools()}
+        elif method == 'tools/call':
+            result = self.call_tool(params.get('name'), params.get('arguments'))
+        else:
+            return {'jsonrpc': '2.0', 'id': msg_id, 'error': {'code': -32601, 'message': f"Method not found: {method}"}}
+        return {'jsonrpc': '2.0', 'id': msg_id, 'result': result}
+
+    def submit(self, message: dict, callback) -> None:
+        """工具调用交给线程池并发执行，其余消息直接处理；响应通过callback返回"""
+        if message.get('method') == 'tools/call':
+            future = self.executor.submit(self.handle, message)
+            future.add_done_callback(lambda f: callback(self._result_or_error(f, message)))
+        else:
+            callback(self.handle(message))
+
+    @staticmethod
+    def _result_or_error(future, message: dict) -> Optional[dict]:
+        try:
+            return future.result()
+        except Exception as e:
+            return {'jsonrpc': '2.0', 'id': message.get('id'), 'error': {'code': -32603, 'message': str(e)}}
+
+    def serve_stdio(self) -> None:
+        """通过stdin/stdout提供服务，每行一条JSON消息"""
+        stdin = sys.stdin.buffer
+        stdout = sys.stdout.buffer
+        # 工具内的print会破坏协议输出，重定向到stderr
+        sys.stdout = sys.stderr
+        write_lock = threading.Lock()
+
+        def reply(response: Optional[dict]):
+            if response is None: return
+            with write_lock:
+                stdout.write(_dumps(response) + b'\n')
+                stdout.flush()
+
+        for line in stdin:
+            if not line.strip(): continue
+            try:
+                message = _loads(line)
+            except ValueError:
+                reply({'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': 'Parse error'}})
+                continue
+            for item in message if isinstance(message, list) else [message]:
+                if isinstance(item, dict):
+                    self.submit(item, reply)
+        self.executor.shutdown(wait=True)
+
+    def serve_http(self, host: str='127.0.0.1', port: int=8000, path: str='/mcp') -> None:
+        """以Streamable HTTP方式提供服务，所有消息POST到同一端点"""
+        server = _HTTPServer((host, port), _make_handler(self, path))
+        print(f'Serving MCP {self.name} on http://{host}:{port}{path}', file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.executor.shutdown(wait=False)
+
+
+_INVALID_REQUEST = {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32600, 'message': 'Invalid Request'}}
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+def _make_handler(mcp: MCPServer, path: str):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, code: int, body: bytes=b'', headers: dict=None):
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            # 先读完请求体，否则长连接上未读的数据会被当作下一个请求解析
+            length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(length)
+            if self.path.split('?')[0] != path:
+                return self._send(404)
+            try:
+                message = _loads(body)
+            except ValueError:
+                return self._send(400, _dumps({'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': 'Parse error'}}))
+            batch = isinstance(message, list)
+            if batch and not message or not isinstance(message, (list, dict)):
+                return self._send(400, _dumps(_INVALID_REQUEST))
+            messages = [m for m in (message if batch else [message]) if isinstance(m, dict)]
+            invalid = [_INVALID_REQUEST for m in (message if batch else [message]) if not isinstance(m, dict)]
+
+            # 先提交批量中的全部消息，工具在线程池中并发执行，当前线程再按原顺序等待结果
+            pending = []
+            for item in messages:
+                done = threading.Event()
+                holder = []
+                mcp.submit(item, lambda response, holder=holder, done=done: (holder.append(response), done.set()))
+                pending.append((done, holder))
+            responses = []
+            for done, holder in pending:
+                done.wait()
+                if holder[0] is not None:
+                    responses.append(holder[0])
+            responses += invalid
+
+            headers = {}
+            if any(m.get('method') == 'initialize' for m in messages):
+                headers['Mcp-Session-Id'] = uuid.uuid4().hex
+            if not responses:
+                return self._send(202, headers=headers)
+            self._send(200, _dumps(responses if batch else responses[0]), headers=headers)
+
+        def do_GET(self):
+            # 不提供服务端推送流
+            self._send(405)
+
+        def do_DELETE(self):
+            self._send(200)
+
+    return Handler
+
+
+def _load_target(target: str) -> Any:
+    module_name, _, attr = target.partition(':')
+    obj = importlib.import_module(module_name)
+    for part in (attr or 'idf').split('.'):
+        obj = getattr(obj, part)
+    if callable(obj) and not isinstance(obj, (Identify, Mind)):
+        obj = obj()
+    return obj
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="dlso-mcp", description="将Identify实例作为MCP服务器运行")
+    parser.add_argument('target', help='module:attr，指向Identify/Mind实例或返回它的函数，attr默认为idf')
+    parser.add_argument('--http', type=int, default=None, help='以Streamable HTTP方式监听的端口，不指定时使用stdio')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--path', default='/mcp')
+    parser.add_argument('--name', default='dlso')
+    parser.add_argument('--workers', type=int, default=8, help='并发执行工具调用的线程数')
+    args = parser.parse_args()
+
+    sys.path.insert(0, '.')
+    server = MCPServer(_load_target(args.target), name=args.name, workers=args.workers)
+    if args.http is None:
+        server.serve_stdio()
+    else:
+        server.serve_http(host=args.host, port=args.http, path=args.path)
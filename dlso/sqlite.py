@@ -1,42 +1,264 @@
+from collections import OrderedDict, namedtuple
 import sqlite3
+import weakref
+import pickle
+import base64
+import json
 import uuid
 import datetime
+import contextlib
+import itertools
+import threading
+import functools
+import time
 import ast
+import re
+
+_DDL = re.compile(r'^\s*(CREATE|ALTER|DROP)\b', re.IGNORECASE)
+_SCAN = re.compile(r'^SCAN (TABLE )?(\w+)$')
+_TYPES = {'INTEGER': int, 'REAL': float, 'TEXT': str, 'BLOB': bytes}
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class _Rollback(Exception):
+    pass
+
+
+_CONFLICT = {None: 'INSERT', 'ignore': 'INSERT OR IGNORE', 'replace': 'INSERT OR REPLACE', 'upsert': 'INSERT'}
+
+
+def _writer(func):
+    # 写操作串行化，连接池模式下所有线程共用一个写连接
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return func(self, *args, **kwargs)
+    return wrapper
+
 
 class RowIterator:
-    def __init__(self, curs, table, query:str=None):
+    # 按arraysize分批fetchmany，使用独立游标，多个迭代可以交错进行
+    def __init__(self, curs, table, query:str=None, params:tuple=(), arraysize:int=1000, row_factory:str=None):
         self.table_name = table
         self.curs = curs
         self.query = query
+        self.params = params
+        self.arraysize = arraysize
+        self.row_factory = row_factory
+        self._rows = None
+        self._make = None
         if not query: self.query = f"SELECT * FROM {self.table_name}"
 
     def __enter__(self):
-        self.curs.execute(self.query)
+        self.execute()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        pass
+        self.close()
+
+    def execute(self):
+        if self.row_factory == 'row':
+            self.curs.row_factory = sqlite3.Row
+        self.curs.execute(self.query, self.params)
+        if self.row_factory == 'namedtuple':
+            Row = namedtuple('Row', [column[0] for column in self.curs.description], rename=True)
+            self._make = Row._make
+        self._rows = iter(())
+
+    def close(self):
+        self._rows = iter(())
+        self.curs.close()
 
     def __iter__(self):
-        return self
+        if self._rows is None: self.execute()
+        return self._generate()
+
+    def _generate(self):
+        yield from self._rows
+        while True:
+            batch = self.curs.fetchmany(self.arraysize)
+            if not batch: break
+            yield from (batch if self._make is None else map(self._make, batch))
+        self.close()
 
     def __next__(self):
-        row = self.curs.fetchone()
-        if row is not None:
-            return row
-        else:
+        if self._rows is None: self.execute()
+        try:
+            return next(self._rows)
+        except StopIteration:
+            pass
+        batch = self.curs.fetchmany(self.arraysize)
+        if not batch:
+            self.close()
             raise StopIteration
+        self._rows = iter(batch if self._make is None else map(self._make, batch))
+        return next(self._rows)
+
+class Query:
+    # 参数化查询构造器：SQL文本只与结构有关，与参数值无关，便于命中语句缓存
+    OPERATORS = {'=', '!=', '<', '<=', '>', '>=', 'like', 'in', 'not in', 'between'}
+
+    def __init__(self, db, table: str):
+        self.db = db
+        self.table = table
+        self._where = []
+        self._params = []
+        self._order = []
+        self._limit = None
+        self._offset = None
+        self._error = None
+
+    def where(self, column: str, op: str, value=None) -> 'Query':
+        op = op.lower()
+        if op not in self.OPERATORS:
+            self._error = f"Invalid operator {op}"
+        elif op in ('in', 'not in'):
+            # 以JSON数组作为单个参数，列表长度变化时SQL文本不变
+            self._where.append((column, f"{column} {op.upper()} (SELECT value FROM json_each(?))"))
+            self._params.append(json.dumps(list(value)))
+        elif op == 'between':
+            self._where.append((column, f"{column} BETWEEN ? AND ?"))
+            self._params.extend(value)
+        else:
+            self._where.append((column, f"{column} {op.upper()} ?"))
+            self._params.append(value)
+        return self
+
+    def between(self, column: str, start, end) -> 'Query':
+        return self.where(column, 'between', (start, end))
+
+    def order_by(self, column: str, descending: bool=False) -> 'Query':
+        self._order.append((column, f"{column} {'DESC' if descending else 'ASC'}"))
+        return self
+
+    def limit(self, limit: int, offset: int=None) -> 'Query':
+        self._limit = limit
+        self._offset = offset
+        return self
+
+    def sql(self, select: str='*') -> tuple:
+        columns = [column for column, _ in self._where + self._order]
+        if self._error is None and not self.db.check_columns_exist(self.table, columns):
+            self._error = "Invalid columns"
+        query = f"SELECT {select} FROM {self.table}"
+        params = list(self._params)
+        if self._where:
+            query += " WHERE " + " AND ".join([clause for _, clause in self._where])
+        if self._order:
+            query += " ORDER BY " + ", ".join([clause for _, clause in self._order])
+        if self._limit is not None:
+            query += " LIMIT ? OFFSET ?"
+            params += [self._limit, self._offset or 0]
+        return query, tuple(params)
+
+    def all(self) -> list:
+        query, params = self.sql()
+        if self._error:
+            print(f"{self._error}. Aborting selection.")
+            return []
+        self.db._check_scan(self.table, query, params)
+        curs = self.db._reader()
+        curs.execute(query, params)
+        columns = [column[0] for column in curs.description]
+        return [dict(zip(columns, row)) for row in curs.fetchall()]
+
+    def first(self) -> dict:
+        limit, offset = self._limit, self._offset
+        self.limit(1, offset)
+        result = self.all()
+        self._limit, self._offset = limit, offset
+        return result[0] if result else None
+
+    def iter(self, arraysize: int=1000, row_factory: str=None) -> RowIterator:
+        query, params = self.sql()
+        if self._error:
+            print(f"{self._error}. Aborting selection.")
+            return iter(())
+        self.db._check_scan(self.table, query, params)
+        return RowIterator(self.db._reader(fresh=True), self.table, query=query, params=params, arraysize=arraysize, row_factory=row_factory)
+
+    def count(self) -> int:
+        limit = self._limit
+        self._limit = None
+        query, params = self.sql('COUNT(*)')
+        self._limit = limit
+        if self._error:
+            print(f"{self._error}. Aborting selection.")
+            return 0
+        curs = self.db._reader()
+        curs.execute(query, params)
+        return curs.fetchone()[0]
+
+    def explain(self) -> list:
+        return self.db._explain(*self.sql())
+
 
 class Database:
-    def __init__(self, path):
+    def __init__(self, path, pooled:bool=False, mmap_size:int=256 * 1024 * 1024, cache_size:int=-64000, cached_statements:int=128):
         self.path = path
+        self.pooled = pooled
+        self.cached_statements = cached_statements
+        self.pragmas = {'mmap_size': mmap_size, 'cache_size': cache_size}
+        if pooled and path == ':memory:':
+            print("In-memory databases cannot be pooled. Falling back to a single connection.")
+            self.pooled = False
+        self._local = threading.local()
+        self._readers = []
+        self._schema = {}
+        self._lock = threading.RLock()
+        self._owner = None
+        self._depth = 0
+        self._batch_ops = None
+        self._batch_interval = None
+        self._pending = 0
+        self._pending_since = 0.0
+        self._timer = None
+        self._scan_threshold = None
+        self._scan_handler = print
+        self._scans = set()
         self.__enter__()
     
     def __enter__(self):
-        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn = self._connect()
+        if self.pooled:
+            self.conn.execute("PRAGMA journal_mode = WAL")
         self.curs = self.conn.cursor()
         return self.curs
 
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=self.cached_statements)
+        # 只有存在全文索引的数据库才开启recursive_triggers，使REPLACE删除旧行时也触发DELETE触发器；
+        # 该设置会改变所有触发器的行为（写入自身表的触发器可能递归），不使用FTS时保持SQLite默认
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND sql LIKE 'CREATE VIRTUAL TABLE % USING fts5%' LIMIT 1").fetchone():
+            conn.execute("PRAGMA recursive_triggers = ON")
+        if self.pooled:
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA busy_timeout = 5000")
+            for pragma, value in self.pragmas.items():
+                conn.execute(f"PRAGMA {pragma} = {int(value)}")
+        return conn
+
+    def _reader(self, fresh:bool=False) -> sqlite3.Cursor:
+        # 连接池模式下每个线程使用自己的只读连接；事务中的线程读写连接以看到未提交的数据
+        # fresh为True时总是返回新游标，供迭代器独占使用
+        if not self.pooled or self._depth and self._owner == threading.get_ident():
+            return self.conn.cursor() if fresh else self.curs
+        if self._pending:
+            # 批量提交模式下还有未提交的写入，改用写连接读取才能看到这些数据
+            return self.conn.cursor()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+            with self._lock:
+                self._readers.append(conn)
+        return conn.cursor()
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.curs:
             self.curs.close()
@@ -52,14 +274,99 @@ class Database:
     def close(self):
         self.conn.close()
 
+    def commit(self):
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            self._pending = 0
+            self.conn.commit()
+
+    def batch_commits(self, ops:int=None, interval:float=None):
+        # 每ops次写入或距首次未提交写入interval毫秒后提交一次；均为None时恢复逐次提交
+        self.commit()
+        self._batch_ops = ops
+        self._batch_interval = interval / 1000 if interval else None
+
+    def _commit(self):
+        if self._depth: return
+        if self._batch_ops is None and self._batch_interval is None:
+            self.conn.commit()
+            return
+        with self._lock:
+            self._pending += 1
+            if self._pending == 1:
+                self._pending_since = time.monotonic()
+                if self._batch_interval:
+                    self._timer = threading.Timer(self._batch_interval, self._flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+            if self._batch_ops and self._pending >= self._batch_ops or \
+               self._batch_interval and time.monotonic() - self._pending_since >= self._batch_interval:
+                self.commit()
+
+    def _flush(self):
+        with self._lock:
+            if self._depth == 0 and self._pending:
+                self.commit()
+
+    @contextlib.contextmanager
+    def _savepoint(self):
+        with self._lock:
+            if not self.conn.in_transaction:
+                self.curs.execute("BEGIN")
+            name = f"dlso_sp{self._depth}"
+            self.curs.execute(f"SAVEPOINT {name}")
+            self._depth += 1
+            self._owner = threading.get_ident()
+            try:
+                yield
+            except BaseException:
+                self.curs.execute(f"ROLLBACK TO {name}")
+                raise
+            finally:
+                self._depth -= 1
+                if not self._depth: self._owner = None
+                self.curs.execute(f"RELEASE {name}")
+
+    @contextlib.contextmanager
+    def transaction(self):
+        # 可嵌套，内层出错只回滚到对应的保存点；期间各写入方法不再单独提交
+        # 最外层事务结束时总是提交（连同之前批量累积的写入），batch_commits只作用于单次调用的提交
+        with self._lock:
+            try:
+                with self._savepoint():
+                    yield self
+            finally:
+                if not self._depth:
+                    self.commit()
+
+    @_writer
     def execute_query(self, query):
         self.curs.execute(query)
-        self.conn.commit()
+        self._commit()
+        if _DDL.match(query):
+            self.invalidate_schema()
+
+    def invalidate_schema(self, table:str=None):
+        self._scans.clear()
+        if table is None:
+            self._schema.clear()
+        else:
+            self._schema.pop(table, None)
+
+    def table_info(self, table) -> list:
+        info = self._schema.get(table)
+        if info is None:
+            curs = self._reader()
+            curs.execute(f"PRAGMA table_info({table})")
+            info = [(column[1], _TYPES.get(column[2]), column[5]) for column in curs.fetchall()]
+            # 表不存在时不缓存，避免在外部建表后一直返回空结果
+            if info: self._schema[table] = info
+        return info
 
     def check_columns_exist(self, table, columns):
-        query = f"PRAGMA table_info({table})"
-        self.curs.execute(query)
-        table_columns = [column[1] for column in self.curs.fetchall()]
+        table_columns = self.get_table_columns(table)
 
         for column in columns:
             if column not in table_columns:
@@ -79,6 +386,8 @@ class Database:
                     data_type = 'TEXT'
                 elif data_type == float:
                     data_type = 'REAL'
+                elif data_type == bytes:
+                    data_type = 'BLOB'
             field_definition = f"{field} {data_type}"
             
             if key and field == key:
@@ -92,63 +401,65 @@ class Database:
         create_table_query += ", ".join(field_definitions)
         create_table_query += ")"
         self.execute_query(create_table_query)
+        self.invalidate_schema(table_name)
     
     def get_table_rows(self, table:str):
         query = f"SELECT COUNT(*) FROM {table}"
-        self.curs.execute(query)
-        result = self.curs.fetchone()[0]
+        curs = self._reader()
+        curs.execute(query)
+        result = curs.fetchone()[0]
         return result
     
-    def iter_table_rows(self, table:str) -> RowIterator:
-        return RowIterator(self.curs, table)
+    def iter_table_rows(self, table:str, arraysize:int=1000, row_factory:str=None) -> RowIterator:
+        return RowIterator(self._reader(fresh=True), table, arraysize=arraysize, row_factory=row_factory)
     
     def get_all_rows(self, table:str):
         query = f"SELECT * FROM {table}"
-        self.curs.execute(query)
-        result = self.curs.fetchall()
+        curs = self._reader()
+        curs.execute(query)
+        result = curs.fetchall()
         return result
     
     def get_all_rows_one_by_one(self, table:str, func):
-        query = f"SELECT * FROM {table}"
-        self.curs.execute(query)
-        row = self.curs.fetchone()
-        while row is not None:
+        for row in self.iter_table_rows(table):
             func(row)
-            row = self.curs.fetchone()
 
     def get_table_columns(self, table):
-        query = f"PRAGMA table_info({table})"
-        self.curs.execute(query)
-        table_columns = [column[1] for column in self.curs.fetchall()]
-        return table_columns
+        return [column for column, _, _ in self.table_info(table)]
+
+    def get_primary_keys(self, table) -> list:
+        return [column for column, _, pk in sorted(self.table_info(table), key=lambda info: info[2]) if pk]
     
     def get_column_type(self, table, column):
-        query = f"PRAGMA table_info({table})"
-        self.curs.execute(query)
-        table_info = self.curs.fetchall()
-        for info in table_info:
-            if info[1] == column:
-                column_type = info[2]
-                if column_type == "INTEGER":
-                    return int
-                elif column_type == "REAL":
-                    return float
-                elif column_type == "TEXT":
-                    return str
-                else:
-                    return None
+        for name, column_type, _ in self.table_info(table):
+            if name == column:
+                return column_type
         return None
     
     def validate_data_types(self, table, data) -> bool:
-        table_columns = self.get_table_columns(table)
-        for column, value in zip(table_columns, data):
-            column_type = self.get_column_type(table, column)
+        for (column, column_type, _), value in zip(self.table_info(table), data):
             if not isinstance(value, column_type):
                 print(value, column_type)
                 return False
         return True
     
-    def insert_data(self, table, data) -> bool:
+    def _insert_query(self, table, columns, on_conflict:str=None, conflict_columns:list=None) -> str:
+        if on_conflict not in _CONFLICT:
+            print("Invalid conflict mode. Aborting insertion.")
+            return None
+        query = f"{_CONFLICT[on_conflict]} INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})"
+        if on_conflict == 'upsert':
+            targets = conflict_columns or self.get_primary_keys(table)
+            if not targets:
+                print("No conflict columns for upsert. Aborting insertion.")
+                return None
+            updates = [column for column in columns if column not in targets]
+            action = ", ".join([f"{column} = excluded.{column}" for column in updates])
+            query += f" ON CONFLICT ({', '.join(targets)}) DO " + (f"UPDATE SET {action}" if updates else "NOTHING")
+        return query
+
+    @_writer
+    def insert_data(self, table, data, on_conflict:str=None, conflict_columns:list=None) -> bool:
         columns = self.get_table_columns(table)
         if isinstance(data, dict):
             if not self.check_columns_exist(table, data.keys()):
@@ -167,12 +478,59 @@ class Database:
             print("Invalid data types. Aborting insertion.")
             return False
 
-        placeholders = ", ".join(["?"] * len(data))
-        query = f"INSERT INTO {table} VALUES ({placeholders})"
+        query = self._insert_query(table, columns, on_conflict, conflict_columns)
+        if query is None: return False
         self.curs.execute(query, data)
-        self.conn.commit()
+        self._commit()
         return True
     
+    @_writer
+    def insert_many(self, table, rows, chunk_size:int=1000, on_conflict:str=None, conflict_columns:list=None) -> int:
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return 0
+
+        columns = self.get_table_columns(table)
+        if isinstance(first, dict):
+            if not self.check_columns_exist(table, first.keys()):
+                print("Invalid columns. Aborting insertion.")
+                return False
+            columns = list(first.keys())
+        elif not isinstance(first, tuple) or len(first) != len(columns):
+            print("Invalid data forms. Aborting insertion.")
+            return False
+        types = [self.get_column_type(table, column) for column in columns]
+
+        query = self._insert_query(table, columns, on_conflict, conflict_columns)
+        if query is None: return False
+
+        def values(row):
+            if isinstance(row, dict):
+                row = tuple([row[column] for column in columns])
+            if len(row) != len(columns):
+                raise ValueError(f"Invalid number of values: {row}")
+            for value, column_type in zip(row, types):
+                if column_type and not isinstance(value, column_type):
+                    raise TypeError(f"Invalid data types: {row}")
+            return row
+
+        # 按块流式写入，整个过程只提交一次
+        count = 0
+        rows = itertools.chain([first], rows)
+        try:
+            with self._savepoint():
+                while True:
+                    chunk = [values(row) for row in itertools.islice(rows, chunk_size)]
+                    if not chunk: break
+                    self.curs.executemany(query, chunk)
+                    count += self.curs.rowcount
+        except (ValueError, TypeError, KeyError, sqlite3.Error) as e:
+            print(f"{e}. Aborting insertion.")
+            count = False
+        self._commit()
+        return count
+
     def convert(self, table, data) -> list:
         columns = self.get_table_columns(table)
         result = []
@@ -181,19 +539,164 @@ class Database:
         return result
 
 
-    def select_data(self, table, conditions, iter:bool=False) -> list:
+    def create_index(self, table, columns, unique:bool=False, name:str=None) -> str:
+        columns = [columns] if isinstance(columns, str) else list(columns)
+        if not self.check_columns_exist(table, columns):
+            print("Invalid columns. Aborting index creation.")
+            return None
+        name = name or f"idx_{table}_{'_'.join(columns)}"
+        self.execute_query(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+        return name
+
+    def drop_index(self, name) -> None:
+        self.execute_query(f"DROP INDEX IF EXISTS {name}")
+
+    def get_indexes(self, table) -> list:
+        curs = self._reader()
+        curs.execute(f"PRAGMA index_list({table})")
+        return [index[1] for index in curs.fetchall()]
+
+    def _explain(self, query, params=()) -> list:
+        curs = self._reader()
+        # 缓存的EXPLAIN语句不会因结构变化重新编译，用schema_version区分SQL文本
+        version = curs.execute("PRAGMA schema_version").fetchone()[0]
+        curs.execute(f"EXPLAIN QUERY PLAN {query} /* schema {version} */", params)
+        return [row[3] for row in curs.fetchall()]
+
+    def explain(self, table, conditions:dict=None) -> list:
+        conditions = conditions or {}
+        if not self.check_columns_exist(table, conditions.keys()):
+            print("Invalid columns. Aborting explanation.")
+            return []
+        query = f"SELECT * FROM {table}"
+        if conditions: query += f" WHERE {self.build_condition_string(conditions)}"
+        return self._explain(query, tuple(conditions.values()))
+
+    def log_scans(self, threshold:int=10000, handler=print):
+        # 查询计划为全表扫描且表行数超过threshold时调用handler提示缺少索引；threshold为None时关闭
+        self._scan_threshold = threshold
+        self._scan_handler = handler
+        self._scans.clear()
+
+    def _check_scan(self, table, query, params=()):
+        # 每条SQL只检查一次，DDL后重新检查
+        if self._scan_threshold is None or query in self._scans: return
+        self._scans.add(query)
+        for detail in self._explain(query, params):
+            match = _SCAN.match(detail)
+            if match and match.group(2) == table:
+                rows = self.get_table_rows(table)
+                if rows > self._scan_threshold:
+                    self._scan_handler(f"Full table scan on {table} ({rows} rows): {query}")
+                return
+
+    def query(self, table) -> Query:
+        return Query(self, table)
+
+    def create_fts(self, table, columns, tokenize:str='unicode61') -> str:
+        # 为table的文本列建立外部内容FTS5表，由触发器保持同步，并索引已有数据
+        # 同时为该数据库开启recursive_triggers（之后打开的连接也会开启），REPLACE才能同步删除旧行的索引
+        columns = [columns] if isinstance(columns, str) else list(columns)
+        if not self.check_columns_exist(table, columns):
+            print("Invalid columns. Aborting FTS creation.")
+            return None
+        fts = f"{table}_fts"
+        names = ", ".join(columns)
+        new = ", ".join([f"new.{column}" for column in columns])
+        old = ", ".join([f"old.{column}" for column in columns])
+        with self._lock:
+            self.conn.execute("PRAGMA recursive_triggers = ON")
+        with self.transaction():
+            self.execute_query(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, content='{table}', content_rowid='rowid', tokenize='{tokenize}')")
+            self.execute_query(f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {names}) VALUES (new.rowid, {new});
+            END""")
+            self.execute_query(f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.rowid, {old});
+            END""")
+            self.execute_query(f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.rowid, {old});
+                INSERT INTO {fts}(rowid, {names}) VALUES (new.rowid, {new});
+            END""")
+            self.execute_query(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+        return fts
+
+    def drop_fts(self, table) -> None:
+        fts = f"{table}_fts"
+        with self.transaction():
+            for suffix in ('ai', 'ad', 'au'):
+                self.execute_query(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+            self.execute_query(f"DROP TABLE IF EXISTS {fts}")
+
+    def search(self, table, query:str, limit:int=20, snippet_tokens:int=16, highlight:tuple=('[', ']')) -> list:
+        # 按bm25排序返回匹配行，附加_rank（越小越相关）和_snippet
+        fts = f"{table}_fts"
+        sql = f"""SELECT {table}.*, bm25({fts}) AS _rank, snippet({fts}, -1, ?, ?, '...', ?) AS _snippet
+                  FROM {fts} JOIN {table} ON {table}.rowid = {fts}.rowid
+                  WHERE {fts} MATCH ? ORDER BY _rank LIMIT ?"""
+        curs = self._reader()
+        try:
+            curs.execute(sql, (*highlight, snippet_tokens, query, limit))
+        except sqlite3.OperationalError as e:
+            print(f"{e}. Aborting search.")
+            return []
+        columns = [column[0] for column in curs.description]
+        return [dict(zip(columns, row)) for row in curs.fetchall()]
+
+    def select_data(self, table, conditions, iter:bool=False, arraysize:int=1000, row_factory:str=None) -> list:
         if not self.check_columns_exist(table, conditions.keys()):
             print("Invalid columns. Aborting selection.")
             return []
 
         conditions_query = " AND ".join([f"{column} = ?" for column in conditions.keys()])
         query = f"SELECT * FROM {table} WHERE {conditions_query}"
-        if iter: return RowIterator(self.curs, table, query=query)
-        self.curs.execute(query, tuple(conditions.values()))
-        result = self.curs.fetchall()
+        self._check_scan(table, query, tuple(conditions.values()))
+        if iter: return RowIterator(self._reader(fresh=True), table, query=query, params=tuple(conditions.values()), arraysize=arraysize, row_factory=row_factory)
+        curs = self._reader()
+        curs.execute(query, tuple(conditions.values()))
+        result = curs.fetchall()
         return self.convert(table, result)
     
-    def select_numble(self, table:str, key:str, start:int, end:int, iter:bool=False) -> list:
+    def paginate(self, table, order_by:str, page_size:int=50, after:str=None, conditions:dict=None, descending:bool=False) -> tuple:
+        # 键集分页：以(order_by, rowid)为游标定位，任意深度的页与第一页代价相同，order_by应有索引
+        # order_by为NULL的行不会出现在结果中
+        conditions = conditions or {}
+        if not self.check_columns_exist(table, [order_by, *conditions.keys()]):
+            print("Invalid columns. Aborting pagination.")
+            return [], None
+
+        where = [self.build_condition_string(conditions)] if conditions else []
+        where.append(f"{order_by} IS NOT NULL")
+        params = list(conditions.values())
+        if after:
+            try:
+                position = json.loads(base64.urlsafe_b64decode(after.encode('ascii')))
+                if not isinstance(position, list) or len(position) != 2:
+                    raise ValueError(position)
+            except (ValueError, TypeError):
+                print("Invalid cursor. Aborting pagination.")
+                return [], None
+            params += position
+            where.append(f"({order_by}, rowid) {'<' if descending else '>'} (?, ?)")
+        direction = 'DESC' if descending else 'ASC'
+        query = f"SELECT *, rowid FROM {table}"
+        if where: query += f" WHERE {' AND '.join(where)}"
+        query += f" ORDER BY {order_by} {direction}, rowid {direction} LIMIT ?"
+        self._check_scan(table, query, (*params, page_size + 1))
+
+        curs = self._reader()
+        curs.execute(query, (*params, page_size + 1))
+        columns = [column[0] for column in curs.description][:-1]
+        rows = curs.fetchall()
+
+        cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = dict(zip(columns, rows[-1]))
+            cursor = base64.urlsafe_b64encode(json.dumps([last[order_by], rows[-1][-1]]).encode('utf-8')).decode('ascii')
+        return [dict(zip(columns, row)) for row in rows], cursor
+
+    def select_numble(self, table:str, key:str, start:int, end:int, iter:bool=False, arraysize:int=1000, row_factory:str=None) -> list:
         columns = self.get_table_columns(table)
 
         if not key in columns:
@@ -204,13 +707,12 @@ class Database:
             print("Invalid type. Aborting selection.")
             return []
         
-        query = f"SELECT * FROM {table} WHERE {key} > {start} AND {key} < {end}"
-        if iter: return RowIterator(self.curs, table, query=query)
-        self.curs.execute(query)
-        result = self.curs.fetchall()
-        return self.convert(table, result)
+        query = self.query(table).where(key, '>', start).where(key, '<', end)
+        if iter: return query.iter(arraysize=arraysize, row_factory=row_factory)
+        return query.all()
 
 
+    @_writer
     def delete_data(self, table, conditions) -> None:
         if not self.check_columns_exist(table, conditions.keys()):
             print("Invalid columns. Aborting deletion.")
@@ -219,7 +721,7 @@ class Database:
         conditions_query = " AND ".join([f"{column} = ?" for column in conditions.keys()])
         query = f"DELETE FROM {table} WHERE {conditions_query}"
         self.curs.execute(query, tuple(conditions.values()))
-        self.conn.commit()
+        self._commit()
 
     def build_set_string(self, data) -> str:
         set_values = ", ".join([f"{column} = ?" for column in data.keys()])
@@ -229,6 +731,7 @@ class Database:
         condition_string = " AND ".join([f"{column} = ?" for column in condition.keys()])
         return condition_string
 
+    @_writer
     def update_data(self, table, data, condition, only=True) -> bool:
         if not self.check_columns_exist(table, data.keys()):
             print("Invalid columns. Aborting update.")
@@ -237,79 +740,386 @@ class Database:
         where_condition = self.build_condition_string(condition)
         query = f"UPDATE {table} SET {self.build_set_string(data)} WHERE {where_condition}"
         values = tuple(data.values()) + tuple(condition.values())
-        self.curs.execute(query, values)
-        rows_affected = self.curs.rowcount
-
-        if only and rows_affected != 1:
+        try:
+            with self._savepoint():
+                self.curs.execute(query, values)
+                if only and self.curs.rowcount != 1:
+                    raise _Rollback
+        except _Rollback:
             print("More than one row affected. Aborting update.")
-            self.conn.rollback()
+            self._commit()
             return False
-        else:
-            self.conn.commit()
-            return True
+        self._commit()
+        return True
     
     def close(self):
+        self.commit()
+        with self._lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
         self.curs.close()
         self.conn.close()
 
 
+_JSON_SCALARS = (str, int, bool, type(None))
+
+
+def _json_exact(value) -> None:
+    # json会把tuple转为list、把非str的键转为str、把nan/inf改写，读回时值已改变；这类值拒绝编码，需要时使用pickle
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        kind = type(item)
+        if kind is dict:
+            for key in item:
+                if type(key) is not str:
+                    raise TypeError(f"JSON keys must be str, got {type(key).__name__}")
+            stack.extend(item.values())
+        elif kind is list:
+            stack.extend(item)
+        elif kind is float:
+            if item != item or item in (float('inf'), float('-inf')):
+                raise ValueError(f"{item} does not round-trip through JSON")
+        elif kind not in _JSON_SCALARS:
+            raise TypeError(f"{kind.__name__} does not round-trip through JSON")
+
+
+class JSONCodec:
+    name = 'json'
+
+    def encode(self, value) -> bytes:
+        _json_exact(value)
+        if orjson is not None:
+            try:
+                return orjson.dumps(value)
+            except TypeError:
+                pass
+        return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+    def decode(self, data: bytes):
+        return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class PickleCodec:
+    name = 'pickle'
+
+    def __init__(self, protocol: int=5):
+        self.protocol = protocol
+
+    def encode(self, value) -> bytes:
+        return pickle.dumps(value, protocol=self.protocol)
+
+    def decode(self, data: bytes):
+        return pickle.loads(data)
+
+
+class MsgpackCodec:
+    name = 'msgpack'
+
+    def __init__(self):
+        try:
+            import msgpack
+        except ImportError:
+            raise ImportError("MsgpackCodec requires msgpack: pip install msgpack")
+        self.msgpack = msgpack
+
+    def encode(self, value) -> bytes:
+        return self.msgpack.packb(value, use_bin_type=True)
+
+    def decode(self, data: bytes):
+        return self.msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+CODECS = {'json': JSONCodec, 'pickle': PickleCodec, 'msgpack': MsgpackCodec}
+_codec_instances = {}
+
+
+def get_codec(codec):
+    if not isinstance(codec, str):
+        CODECS.setdefault(codec.name, type(codec))
+        _codec_instances.setdefault(codec.name, codec)
+        return codec
+    if codec not in _codec_instances:
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec: {codec}")
+        _codec_instances[codec] = CODECS[codec]()
+    return _codec_instances[codec]
+
+
+_MISS = object()
+_DELETED = object()
+_CACHES = weakref.WeakValueDictionary()
+
+
+class _DictCache:
+    # 同一进程内同一张表的所有Dictionary共享一个缓存，保证失效正确
+    # 缓存编码后的(value, type)，每次命中重新解码，调用方修改返回的对象不会影响缓存；_DELETED表示key不存在
+    def __init__(self, size: int, write_back: bool, interval: float):
+        self.size = size
+        self.write_back = write_back
+        self.interval = interval
+        self.data = OrderedDict()
+        self.dirty = {}
+        self.flushing = {}
+        self.generation = 0
+        self.timer = None
+        self.lock = threading.RLock()
+        self.flush_lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.data:
+                self.data.move_to_end(key)
+                return self.data[key]
+            for pending in (self.dirty, self.flushing):
+                if key in pending:
+                    return pending[key]
+            return _MISS
+
+    def put(self, key, encoded, generation=None):
+        with self.lock:
+            # 读取数据库期间有写入时放弃回填，避免缓存旧值
+            if generation is not None and generation != self.generation:
+                return
+            self.data[key] = encoded
+            self.data.move_to_end(key)
+            while len(self.data) > self.size:
+                self.data.popitem(last=False)
+
+    def write(self, key, encoded) -> bool:
+        with self.lock:
+            self.generation += 1
+            self.put(key, encoded)
+            if not self.write_back:
+                return False
+            self.dirty[key] = encoded
+            return len(self.dirty) == 1
+
+
 class Dictionary:
-    def __init__(self, db: Database, table: str) -> None:
+    def __init__(self, db: Database, table: str, cache_size: int=0, write_back: bool=False, flush_interval: float=1.0, codec='json') -> None:
         self.db = db
         self.table = table
-        self.fields = {'key': str, 'value': str, 'type': str}
-        self.db.create_table(self.table, self.fields)
-    
+        self.codec = get_codec(codec)
+        self.fields = {'key': str, 'value': bytes, 'type': str}
+        self.db.create_table(self.table, self.fields, key='key')
+        if self.db.get_primary_keys(self.table) != ['key'] or self.db.get_column_type(self.table, 'value') is not bytes:
+            self.migrate()
+
+        self._ident = (id(db) if db.path == ':memory:' else db.path, table)
+        self._own_cache = None
+        if cache_size or write_back:
+            cache = _CACHES.get(self._ident)
+            if cache is None:
+                cache = _DictCache(cache_size or 1024, write_back, flush_interval)
+                _CACHES[self._ident] = cache
+            cache.size = max(cache.size, cache_size)
+            self._own_cache = cache
+
+    @property
+    def _cache(self) -> _DictCache:
+        return self._own_cache or _CACHES.get(self._ident)
+
+    @contextlib.contextmanager
+    def _write_lock(self, cache: _DictCache):
+        # 直写模式下数据库写入和缓存更新在同一把锁内完成，两者的先后顺序才一致；
+        # 先取数据库锁，与事务中调用set时的加锁顺序相同，避免死锁
+        if cache is None or cache.write_back:
+            yield
+            return
+        with self.db._lock, cache.lock:
+            yield
+
+    def _write(self, key, encoded) -> None:
+        cache = self._cache
+        if cache is None: return
+        if cache.write(key, encoded) and cache.interval:
+            self._schedule(cache)
+
+    def _schedule(self, cache: _DictCache) -> None:
+        cache.timer = threading.Timer(cache.interval, self.flush)
+        cache.timer.daemon = True
+        cache.timer.start()
+
+    def flush(self) -> None:
+        # 写回模式下将脏数据在一个事务中批量写入
+        cache = self._cache
+        if cache is None: return
+        with cache.flush_lock:
+            with cache.lock:
+                if cache.timer:
+                    cache.timer.cancel()
+                    cache.timer = None
+                dirty, cache.dirty = cache.dirty, {}
+                cache.flushing = dirty
+            if not dirty: return
+            failed = True
+            try:
+                upserts = [(key, *value) for key, value in dirty.items() if value is not _DELETED]
+                deletes = [key for key, value in dirty.items() if value is _DELETED]
+                with self.db.transaction():
+                    if upserts and self.db.insert_many(self.table, upserts, on_conflict='upsert') is False:
+                        raise sqlite3.DatabaseError(f"Failed to flush {self.table}")
+                    for key in deletes: self.db.delete_data(self.table, {'key': key})
+                failed = False
+            finally:
+                with cache.lock:
+                    if failed:
+                        # 写入失败时放回dirty等待下次写回，期间更新的值优先
+                        cache.dirty = {**dirty, **cache.dirty}
+                        if cache.interval and cache.timer is None: self._schedule(cache)
+                    cache.flushing = {}
+                    cache.generation += 1
+
+    def close(self) -> None:
+        self.flush()
+
+    def migrate(self) -> None:
+        # 旧版表没有主键且value为TEXT，重建为新结构；重复的key保留最后写入的值，旧数据按原类型标记读取
+        temp = f"{self.table}__migrate"
+        with self.db.transaction():
+            self.db.execute_query(f"DROP TABLE IF EXISTS {temp}")
+            self.db.create_table(temp, self.fields, key='key')
+            self.db.execute_query(f"INSERT OR REPLACE INTO {temp} (key, value, type) SELECT key, value, type FROM {self.table} ORDER BY rowid")
+            self.db.execute_query(f"DROP TABLE {self.table}")
+            self.db.execute_query(f"ALTER TABLE {temp} RENAME TO {self.table}")
     def identify(self, value):
-        val_type = 'non'
-        if type(value)  == int:
-            value = str(value)
-            val_type = 'int'
-        if type(value) in [dict, list, tuple]:
-            value = str(value)
-            val_type = 'ast'
-        if type(value) == str: val_type = 'str'
-        return value, val_type
+        # str和int直接保存，其余类型交给编解码器；无法编码时标记为non
+        if type(value) == str:
+            return value.encode('utf-8'), 'str'
+        if type(value) == int:
+            return str(value).encode('ascii'), 'int'
+        try:
+            return self.codec.encode(value), self.codec.name
+        except (TypeError, ValueError, OverflowError, pickle.PicklingError):
+            return value, 'non'
+
+    @staticmethod
+    def restore(value, val_type):
+        if val_type == 'str':
+            return value.decode('utf-8') if isinstance(value, bytes) else value
+        if val_type == 'int':
+            return int(value)
+        if val_type == 'ast':
+            return ast.literal_eval(value)
+        return get_codec(val_type).decode(value)
+
+    def _restore(self, value, val_type):
+        # pickle解码可以执行任意代码，只有显式选择codec='pickle'时才读取pickle数据
+        if val_type == 'pickle' and self.codec.name != 'pickle':
+            raise ValueError(f"{self.table} contains pickled values; open it with codec='pickle' to read them")
+        return self.restore(value, val_type)
 
     def __setitem__(self, key: str, value) -> None:
         self.set(key, value)
 
     def __getitem__(self, key: str) -> str:
-        result = self.get(key)
-        if result:
-            return result
-        raise KeyError(key)
+        result = self.get(key, _MISS)
+        if result is _MISS:
+            raise KeyError(key)
+        return result
 
     def __delitem__(self, key: str) -> None:
-        self.db.delete_data(self.table, {'key': key})
+        self.delete(key)
+
+    def __contains__(self, key: str) -> bool:
+        cache = self._cache
+        if cache:
+            encoded = cache.get(key)
+            if encoded is not _MISS:
+                return encoded is not _DELETED
+        curs = self.db._reader()
+        curs.execute(f"SELECT 1 FROM {self.table} WHERE key = ?", (key,))
+        return curs.fetchone() is not None
+
+    def __len__(self) -> int:
+        self.flush()
+        return self.db.get_table_rows(self.table)
+
+    def __iter__(self):
+        return (key for key, _ in self.items())
 
     def set(self, key: str, value) -> None:
         if not type(key) == str:
             return
-        value, val_type = self.identify(value)
-        result = self.db.select_data(self.table, {'key': key})
-        if result:
-            self.db.update_data(self.table, {'value': value, 'type': val_type}, {'key': key})
-        else:
-            self.db.insert_data(self.table, {'key': key, 'value': value, 'type': val_type})
+        encoded = self.identify(value)
+        if encoded[1] == 'non':
+            print("Invalid data types. Aborting insertion.")
+            return
+        cache = self._cache
+        with self._write_lock(cache):
+            if not (cache and cache.write_back):
+                self.db.insert_data(self.table, (key, *encoded), on_conflict='upsert')
+            self._write(key, encoded)
+
+    def update(self, data: dict=None, **kwargs) -> None:
+        items = dict(data or {}, **kwargs)
+        items = {key: self.identify(value) for key, value in items.items() if type(key) == str}
+        cache = self._cache
+        with self._write_lock(cache):
+            if not (cache and cache.write_back):
+                rows = ((key, *encoded) for key, encoded in items.items() if encoded[1] != 'non')
+                self.db.insert_many(self.table, rows, on_conflict='upsert')
+            for key, encoded in items.items():
+                if encoded[1] != 'non':
+                    self._write(key, encoded)
 
-    def get(self, key: str) -> str:
+    def get(self, key: str, default=None):
         if not type(key) == str:
-            return
-        result = self.db.select_data(self.table, {'key': key})
-        if result:
-            value =  result[0]['value']
-            val_type = result[0]['type']
-            if val_type == 'int':
-                return int(value)
-            if val_type == 'ast':
-                return ast.literal_eval(value)
-            return value
-        return None
+            return default
+        cache = self._cache
+        if cache:
+            encoded = cache.get(key)
+            if encoded is not _MISS:
+                return default if encoded is _DELETED else self._restore(*encoded)
+            generation = cache.generation
+        curs = self.db._reader()
+        curs.execute(f"SELECT value, type FROM {self.table} WHERE key = ?", (key,))
+        result = curs.fetchone()
+        if cache:
+            cache.put(key, result or _DELETED, generation)
+        return self._restore(*result) if result else default
+
+    def get_many(self, keys: list) -> dict:
+        keys = [key for key in keys if type(key) == str]
+        result = {}
+        cache = self._cache
+        if cache:
+            missing = []
+            for key in keys:
+                encoded = cache.get(key)
+                if encoded is _MISS:
+                    missing.append(key)
+                elif encoded is not _DELETED:
+                    result[key] = self._restore(*encoded)
+            keys = missing
+            generation = cache.generation
+        found = {}
+        curs = self.db._reader()
+        # 分批查询，避免超出SQLite的参数数量限制
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            curs.execute(f"SELECT key, value, type FROM {self.table} WHERE key IN ({', '.join(['?'] * len(chunk))})", chunk)
+            for key, value, val_type in curs.fetchall():
+                found[key] = (value, val_type)
+        if cache:
+            for key in keys:
+                cache.put(key, found.get(key, _DELETED), generation)
+        result.update((key, self._restore(*encoded)) for key, encoded in found.items())
+        return result
+
+    def items(self):
+        self.flush()
+        query = f"SELECT key, value, type FROM {self.table} ORDER BY key"
+        for key, value, val_type in RowIterator(self.db._reader(fresh=True), self.table, query=query):
+            yield key, self._restore(value, val_type)
 
     def delete(self, key: str) -> None:
         if not type(key) == str:
             return
-        self.db.delete_data(self.table, {'key': key})
-
-
+        cache = self._cache
+        with self._write_lock(cache):
+            if not (cache and cache.write_back):
+                self.db.delete_data(self.table, {'key': key})
+            self._write(key, _DELETED)
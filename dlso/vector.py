@@ -0,0 +1,519 @@
+from typing  import Callable, Dict, List, Union
+from .sqlite import Database, RowIterator
+import threading
+import math
+import json
+import os
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("VectorStore requires numpy: pip install numpy")
+    return numpy
+
+
+def _top_k(np, scores, k: int):
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class IVFIndex:
+    def __init__(self, dim: int, nlist: int, metric: str='cosine'):
+        """倒排文件（IVF）近似最近邻索引：k-means聚类中心作为粗量化器，检索时只扫描nprobe个最近的簇
+
+        Args:
+            dim: 向量维度
+            nlist: 聚类中心数量，通常取4*sqrt(N)左右
+            metric: 'cosine'或'dot'
+        """
+        self.np = _numpy()
+        self.dim = dim
+        self.nlist = nlist
+        self.metric = metric
+        self.centroids = None
+        self._vectors = [None] * nlist
+        self._sizes = [0] * nlist
+        self._ids: List[List[str]] = [[] for _ in range(nlist)]
+        self._where: Dict[str, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def _prepare(self, vectors):
+        np = self.np
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if self.metric == 'cosine':
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1, norms)
+        return vectors
+
+    def _assign(self, vectors, batch: int=8192):
+        # 分批计算，避免N*nlist的距离矩阵占用过多内存；argmin||x-c||² = argmax(x·c - ||c||²/2)
+        np = self.np
+        bias = 0.5 * (self.centroids ** 2).sum(axis=1)
+        assign = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), batch):
+            scores = vectors[start:start + batch] @ self.centroids.T - bias
+            assign[start:start + batch] = scores.argmax(axis=1)
+        return assign
+
+    def train(self, vectors, iterations: int=10, sample: int=None, seed: int=0) -> None:
+        """在向量（或其中的采样）上运行k-means得到聚类中心"""
+        np = self.np
+        vectors = self._prepare(vectors)
+        rng = np.random.default_rng(seed)
+        sample = sample or 32 * self.nlist
+        if len(vectors) > sample:
+            vectors = vectors[rng.choice(len(vectors), sample, replace=False)]
+        if len(vectors) < self.nlist:
+            raise ValueError(f"Need at least {self.nlist} vectors to train, got {len(vectors)}")
+        self.centroids = vectors[rng.choice(len(vectors), self.nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = self._assign(vectors)
+            order = np.argsort(assign, kind='stable')
+            counts = np.bincount(assign, minlength=self.nlist)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            filled = counts > 0
+            sums = np.add.reduceat(vectors[order], starts[filled], axis=0)
+            self.centroids[filled] = sums / counts[filled, None]
+            # 空簇重新随机初始化
+            empty = np.flatnonzero(~filled)
+            if len(empty):
+                self.centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+            if self.metric == 'cosine':
+                norms = np.linalg.norm(self.centroids, axis=1, keepdims=True)
+                self.centroids /= np.where(norms == 0, 1, norms)
+
+    def add(self, ids: List[str], vectors) -> None:
+        """加入向量，已存在的id会被替换；不需要重新训练"""
+        np = self.np
+        if not self.trained:
+            raise ValueError("Index must be trained before adding vectors")
+        vectors = self._prepare(vectors)
+        self.remove([id for id in ids if id in self._where])
+        assign = self._assign(vectors)
+        for list_no in np.unique(assign).tolist():
+            members = np.flatnonzero(assign == list_no)
+            size = self._sizes[list_no]
+            store = self._vectors[list_no]
+            if store is None or size + len(members) > len(store):
+                grown = np.empty((max(size + len(members), 2 * size, 16), self.dim), dtype=np.float32)
+                if store is not None: grown[:size] = store[:size]
+                store = self._vectors[list_no] = grown
+            store[size:size + len(members)] = vectors[members]
+            for offset, member in enumerate(members.tolist()):
+                self._ids[list_no].append(ids[member])
+                self._where[ids[member]] = (list_no, size + offset)
+            self._sizes[list_no] = size + len(members)
+
+    def changed(self, ids: List[str], vectors, tol: float=1e-4) -> List[str]:
+        """返回ids中不在索引里、或索引保存的向量与vectors不一致的id"""
+        np = self.np
+        vectors = self._prepare(vectors)
+        found = [i for i, id in enumerate(ids) if id in self._where]
+        changed = set(range(len(ids))) - set(found)
+        if found:
+            stored = np.stack([self._vectors[list_no][pos] for list_no, pos in (self._where[ids[i]] for i in found)])
+            diff = np.abs(stored - vectors[found]).max(axis=1)
+            changed.update(found[i] for i in np.flatnonzero(diff > tol).tolist())
+        return [ids[i] for i in sorted(changed)]
+
+    def remove(self, ids: List[str]) -> None:
+        for id in ids:
+            location = self._where.pop(id, None)
+            if location is None: continue
+            list_no, pos = location
+            last = self._sizes[list_no] - 1
+            if pos != last:
+                self._vectors[list_no][pos] = self._vectors[list_no][last]
+                moved = self._ids[list_no][pos] = self._ids[list_no][last]
+                self._where[moved] = (list_no, pos)
+            self._ids[list_no].pop()
+            self._sizes[list_no] = last
+
+    def search(self, query, k: int=10, nprobe: int=8) -> List[tuple]:
+        """返回[(id, score)]；nprobe越大召回越高、耗时越长"""
+        np = self.np
+        q = self._prepare(query)[0]
+        probes = _top_k(np, self.centroids @ q, nprobe)
+        ids, scores = [], []
+        for list_no in probes.tolist():
+            size = self._sizes[list_no]
+            if not size: continue
+            scores.append(self._vectors[list_no][:size] @ q)
+            ids.extend(self._ids[list_no])
+        if not ids:
+            return []
+        scores = np.concatenate(scores)
+        top = _top_k(np, scores, k)
+        return [(ids[i], float(scores[i])) for i in top.tolist()]
+
+    def save(self, path: str) -> None:
+        np = self.np
+        lists = [list_no for list_no in range(self.nlist) if self._sizes[list_no]]
+        vectors = [self._vectors[list_no][:self._sizes[list_no]] for list_no in lists]
+        ids = [id for list_no in lists for id in self._ids[list_no]]
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                meta=np.array(json.dumps({'dim': self.dim, 'nlist': self.nlist, 'metric': self.metric})),
+                centroids=self.centroids,
+                lists=np.array(lists, dtype=np.int64),
+                sizes=np.array([self._sizes[list_no] for list_no in lists], dtype=np.int64),
+                vectors=np.concatenate(vectors) if vectors else np.empty((0, self.dim), dtype=np.float32),
+                ids=np.array(ids, dtype=str),
+            )
+
+    @classmethod
+    def load(cls, path: str) -> 'IVFIndex':
+        np = _numpy()
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            index = cls(meta['dim'], meta['nlist'], meta['metric'])
+            index.centroids = data['centroids']
+            vectors, ids, start = data['vectors'], data['ids'].tolist(), 0
+            for list_no, size in zip(data['lists'].tolist(), data['sizes'].tolist()):
+                index._vectors[list_no] = vectors[start:start + size].copy()
+                index._ids[list_no] = ids[start:start + size]
+                index._sizes[list_no] = size
+                for pos, id in enumerate(index._ids[list_no]):
+                    index._where[id] = (list_no, pos)
+                start += size
+        return index
+
+
+class VectorStore:
+    def __init__(self, db: Database, table: str, dim: int=None, metric: str='cosine', embed: Callable[[str], List[float]]=None,
+                 index_path: str=None, quantize: str=None, rerank: int=None):
+        """以Database表保存float32向量（BLOB），在内存中维护连续矩阵做向量化top-k检索
+
+        Args:
+            db: Database实例
+            table: 表名
+            dim: 向量维度，为None时由第一次写入决定
+            metric: 'cosine'或'dot'
+            embed: 文本转向量的函数（如Endpoint.embed），提供后可直接用文本写入和检索
+            index_path: IVF索引文件路径，存在时载入并与表中的数据对齐；upsert/delete只修改内存中的索引，
+                        需要调用save_index()写回文件
+            quantize: 内存中只保存量化后的向量：'int8'（约1/4内存）或'binary'（约1/32内存），
+                      检索时先用量化向量粗排，再从数据库读取候选的原始向量精确重排
+            rerank: 粗排候选数量为k*rerank，默认int8为4，binary为10
+        """
+        if metric not in ('cosine', 'dot'):
+            raise ValueError(f"Unsupported metric: {metric}")
+        if quantize not in (None, 'int8', 'binary'):
+            raise ValueError(f"Unsupported quantization: {quantize}")
+        self.np = _numpy()
+        self.db = db
+        self.table = table
+        self.dim = dim
+        self.metric = metric
+        self.embed = embed
+        self.quantize = quantize
+        self.rerank = rerank or {None: 1, 'int8': 4, 'binary': 10}[quantize]
+        self.fields = {'id': str, 'vector': bytes, 'document': str, 'metadata': str}
+        self.db.create_table(self.table, self.fields, key='id')
+
+        self._lock = threading.RLock()
+        self._matrix = None
+        self._scales = None
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._documents: List[str] = []
+        self._metadatas: List[dict] = []
+        self.index: IVFIndex = None
+        self.index_path = index_path
+        self._stale: List[str] = None
+        if index_path and os.path.exists(index_path):
+            # 先载入索引，载入向量时顺便找出索引中缺少或已过期的id
+            self.index = IVFIndex.load(index_path)
+            self._stale = []
+        self.load()
+        if self.index is not None:
+            self._sync_index()
+
+    def load(self, batch: int=4096) -> None:
+        """从数据库载入全部向量，分批编码，量化模式下不会在内存中保留完整的float32矩阵"""
+        np = self.np
+        with self._lock:
+            ids, documents, metadatas, codes, scales, pending = [], [], [], [], [], []
+
+            def encode():
+                prepared = self._prepare(np.vstack(pending))
+                if self._stale is not None and self.index.dim == self.dim:
+                    self._stale += self.index.changed(ids[-len(pending):], prepared)
+                code, scale = self._encode(prepared)
+                codes.append(code)
+                if scale is not None: scales.append(scale)
+                pending.clear()
+
+            query = f"SELECT id, vector, document, metadata FROM {self.table}"
+            for id, vector, document, metadata in RowIterator(self.db._reader(fresh=True), self.table, query=query):
+                ids.append(id)
+                pending.append(np.frombuffer(vector, dtype=np.float32))
+                documents.append(document)
+                metadatas.append(json.loads(metadata) if metadata else {})
+                if len(pending) == batch: encode()
+            if pending: encode()
+            self._ids, self._documents, self._metadatas = ids, documents, metadatas
+            self._rows = {id: row for row, id in enumerate(ids)}
+            self._matrix = np.concatenate(codes) if codes else None
+            self._scales = np.concatenate(scales) if scales else None
+
+    def _prepare(self, vectors):
+        np = self.np
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+        if self.metric == 'cosine':
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1, norms)
+        return vectors
+
+    def _encode(self, vectors) -> tuple:
+        # int8为每个向量一个缩放系数的对称标量量化；binary只保留符号位，8维压缩为1字节
+        np = self.np
+        if self.quantize == 'int8':
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1
+            return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+        if self.quantize == 'binary':
+            return np.packbits(vectors > 0, axis=1), None
+        return vectors, None
+
+    def _reserve(self, count: int) -> None:
+        # 容量按倍数增长，追加时不必每次重建整个矩阵
+        np = self.np
+        size = len(self._ids)
+        if self._matrix is None:
+            shape = {'int8': (self.dim, np.int8), 'binary': ((self.dim + 7) // 8, np.uint8)}.get(self.quantize, (self.dim, np.float32))
+            self._matrix = np.empty((max(count, 16), shape[0]), dtype=shape[1])
+            if self.quantize == 'int8':
+                self._scales = np.empty(max(count, 16), dtype=np.float32)
+        elif size + count > len(self._matrix):
+            capacity = max(size + count, len(self._matrix) * 2)
+            matrix = np.empty((capacity, self._matrix.shape[1]), dtype=self._matrix.dtype)
+            matrix[:size] = self._matrix[:size]
+            self._matrix = matrix
+            if self._scales is not None:
+                scales = np.empty(capacity, dtype=np.float32)
+                scales[:size] = self._scales[:size]
+                self._scales = scales
+
+    @property
+    def nbytes(self) -> int:
+        """内存中向量（含量化系数）占用的字节数"""
+        size = len(self._ids)
+        if self._matrix is None: return 0
+        return self._matrix[:size].nbytes + (self._scales[:size].nbytes if self._scales is not None else 0)
+
+    def _vectors(self, ids: List[str]):
+        # 从数据库读取原始向量，顺序与ids一致
+        np = self.np
+        query, params = self.db.query(self.table).where('id', 'in', ids).sql('id, vector')
+        curs = self.db._reader()
+        curs.execute(query, params)
+        found = {id: vector for id, vector in curs.fetchall()}
+        return self._prepare(np.vstack([np.frombuffer(found[id], dtype=np.float32) for id in ids]))
+
+    def create_index(self, nlist: int=None, iterations: int=10, path: str=None) -> IVFIndex:
+        """用当前全部向量训练并建立IVF索引，之后的写入会同步到索引；索引保存完整的float32向量"""
+        with self._lock:
+            if not self._ids:
+                raise ValueError("Cannot build an index on an empty store")
+            matrix = self._matrix[:len(self._ids)] if self.quantize is None else self._vectors(self._ids)
+            index = IVFIndex(self.dim, nlist or max(1, int(4 * math.sqrt(len(self._ids)))), self.metric)
+            index.train(matrix, iterations=iterations)
+            index.add(self._ids, matrix)
+            self.index = index
+            self.index_path = path or self.index_path
+            if self.index_path:
+                index.save(self.index_path)
+            return index
+
+    def _sync_index(self) -> None:
+        # 索引文件可能落后于表：移除表中已删除的id，重新加入保存之后新增或更新过的行
+        with self._lock:
+            index, missing, self._stale = self.index, self._stale or [], None
+            if index.metric != self.metric or (self.dim is not None and index.dim != self.dim):
+                print(f"Index {self.index_path} does not match the store (dim={self.dim}, metric={self.metric}). Rebuilding.")
+                self.index = None
+                if self._ids:
+                    self.create_index(nlist=min(index.nlist, len(self._ids)))
+                return
+            index.remove([id for id in index._where if id not in self._rows])
+            if not missing: return
+            if self.quantize is None:
+                vectors = self._matrix[[self._rows[id] for id in missing]]
+            else:
+                vectors = self._vectors(missing)
+            self.index.add(missing, vectors)
+
+    def save_index(self, path: str=None) -> None:
+        if self.index is None: return
+        self.index_path = path or self.index_path
+        self.index.save(self.index_path)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._rows
+
+    def upsert(self, ids: Union[str, List[str]], vectors=None, documents: List[str]=None, metadatas: List[dict]=None) -> None:
+        """写入或更新向量；未提供vectors时用embed从documents生成"""
+        np = self.np
+        if isinstance(ids, str):
+            ids = [ids]
+            documents = [documents] if isinstance(documents, str) else documents
+            metadatas = [metadatas] if isinstance(metadatas, dict) else metadatas
+        if vectors is None:
+            if self.embed is None or documents is None:
+                raise ValueError("vectors or documents with an embed function are required")
+            vectors = [self.embed(document) for document in documents]
+        raw = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        documents = documents or [''] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+        if not (len(raw) == len(documents) == len(metadatas)):
+            raise ValueError("ids, vectors, documents and metadatas must have the same length")
+        prepared = self._prepare(raw)
+        codes, scales = self._encode(prepared)
+
+        with self._lock:
+            rows = [(id, raw[i].tobytes(), documents[i], json.dumps(metadatas[i], ensure_ascii=False)) for i, id in enumerate(ids)]
+            if self.db.insert_many(self.table, rows, on_conflict='upsert') is False:
+                raise ValueError(f"Failed to write vectors to {self.table}")
+            self._reserve(len(ids))
+            for i, id in enumerate(ids):
+                row = self._rows.get(id)
+                if row is None:
+                    row = len(self._ids)
+                    self._rows[id] = row
+                    self._ids.append(id)
+                    self._documents.append(documents[i])
+                    self._metadatas.append(metadatas[i])
+                else:
+                    self._documents[row] = documents[i]
+                    self._metadatas[row] = metadatas[i]
+                self._matrix[row] = codes[i]
+                if scales is not None: self._scales[row] = scales[i]
+            if self.index is not None:
+                self.index.add(ids, prepared)
+
+    def delete(self, ids: Union[str, List[str]]) -> None:
+        """删除向量，用最后一行填补空位"""
+        if isinstance(ids, str): ids = [ids]
+        with self._lock:
+            with self.db.transaction():
+                for id in ids:
+                    self.db.delete_data(self.table, {'id': id})
+            for id in ids:
+                row = self._rows.pop(id, None)
+                if row is None: continue
+                last = len(self._ids) - 1
+                if row != last:
+                    self._matrix[row] = self._matrix[last]
+                    if self._scales is not None: self._scales[row] = self._scales[last]
+                    self._ids[row] = self._ids[last]
+                    self._documents[row] = self._documents[last]
+                    self._metadatas[row] = self._metadatas[last]
+                    self._rows[self._ids[row]] = row
+                self._ids.pop()
+                self._documents.pop()
+                self._metadatas.pop()
+            if self.index is not None:
+                self.index.remove(ids)
+
+    def get(self, id: str) -> dict:
+        row = self._rows.get(id)
+        if row is None:
+            return None
+        curs = self.db._reader()
+        curs.execute(f"SELECT vector FROM {self.table} WHERE id = ?", (id,))
+        vector = self.np.frombuffer(curs.fetchone()[0], dtype=self.np.float32)
+        return {'id': id, 'vector': vector, 'document': self._documents[row], 'metadata': self._metadatas[row]}
+
+    def _filter(self, where: Union[dict, Callable[[dict], bool]]):
+        if callable(where):
+            return [row for row, metadata in enumerate(self._metadatas) if where(metadata)]
+        return [row for row, metadata in enumerate(self._metadatas) if all(metadata.get(key) == value for key, value in where.items())]
+
+    def _scores(self, q, rows=None, batch: int=4096):
+        """计算全部（或rows指定的）向量与q的相似度，量化模式下为近似值；分批计算避免生成完整的float32副本"""
+        np = self.np
+        size = len(self._ids) if rows is None else len(rows)
+        if self.quantize == 'binary':
+            bits = np.packbits(q > 0)
+            popcount = getattr(np, 'bitwise_count', None)
+            if popcount is None:
+                table = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+                popcount = lambda x: table[x]
+        scores = np.empty(size, dtype=np.float32)
+        for start in range(0, size, batch):
+            chunk = slice(start, min(start + batch, size)) if rows is None else rows[start:start + batch]
+            codes = self._matrix[chunk]
+            if self.quantize == 'int8':
+                scores[start:start + batch] = (codes.astype(np.float32) @ q) * self._scales[chunk]
+            elif self.quantize == 'binary':
+                scores[start:start + batch] = -popcount(codes ^ bits).sum(axis=1, dtype=np.int32)
+            else:
+                scores[start:start + batch] = codes @ q
+        return scores
+
+    def search(self, query, k: int=10, where: Union[dict, Callable[[dict], bool]]=None, nprobe: int=8, exact: bool=False) -> List[dict]:
+        """检索最相似的k个向量
+
+        Args:
+            query: 查询向量，或提供了embed时的查询文本
+            k: 返回数量
+            where: 元数据过滤条件，字典表示各字段相等，也可以是接收metadata返回bool的函数
+            nprobe: 建立了索引时扫描的簇数量
+            exact: 为True时忽略索引做精确检索；有where条件时总是精确检索
+        """
+        np = self.np
+        if isinstance(query, str):
+            if self.embed is None:
+                raise ValueError("Text queries require an embed function")
+            query = self.embed(query)
+        q = self._prepare(query)[0]
+        with self._lock:
+            if not self._ids:
+                return []
+            if self.index is not None and not where and not exact:
+                results = [(id, score) for id, score in self.index.search(q, k, nprobe) if id in self._rows]
+                top = np.array([self._rows[id] for id, _ in results], dtype=np.int64)
+                scores = np.array([score for _, score in results], dtype=np.float32)
+            else:
+                rows = None
+                if where:
+                    rows = np.asarray(self._filter(where), dtype=np.int64)
+                    if not len(rows): return []
+                scores = self._scores(q, rows)
+                top = _top_k(np, scores, k * self.rerank)
+                if rows is not None: top = rows[top]
+                if self.quantize is None:
+                    scores = scores[_top_k(np, scores, k)] if rows is None else self._matrix[top] @ q
+                else:
+                    # 用数据库中的原始向量对候选精确重排
+                    scores = self._vectors([self._ids[row] for row in top.tolist()]) @ q
+                    order = _top_k(np, scores, k)
+                    top, scores = top[order], scores[order]
+            return [{
+                'id': self._ids[row],
+                'score': float(score),
+                'document': self._documents[row],
+                'metadata': self._metadatas[row],
+            } for row, score in zip(top.tolist(), scores.tolist())]
@@ -7,6 +7,11 @@ setuptools.setup(
     author_email="acdphc@qq.com",
     description="A toolkit",
     packages=setuptools.find_packages(),
+    entry_points={
+        "console_scripts": [
+            "dlso-mcp=dlso.mcp_server:main",
+        ],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: Apache License 2.0",